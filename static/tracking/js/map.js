@@ -20,17 +20,16 @@
         }
     }
 
-    const center = parseJSONContent("initial-map-center") || { lat: 0, lng: 0 };
-    const initialVehicles = parseJSONContent("initial-vehicle-data") || [];
-    const initialTimestamp =
-        parseJSONContent("initial-generation-time") || new Date().toISOString();
-    const initialTrafficFeatures =
-        parseJSONContent("initial-traffic-overlay") || [];
-    const initialTrafficMeta = parseJSONContent("initial-traffic-meta") || {};
-    const initialGeofences = parseJSONContent("initial-geofences") || [];
-    const initialDepots = parseJSONContent("initial-depots") || [];
-    const routeCatalog = parseJSONContent("initial-route-catalog") || [];
-    const initialLegend = parseJSONContent("initial-map-legend") || {};
+    const bootstrap = parseJSONContent("map-bootstrap") || {};
+    const center = bootstrap.center || { lat: 0, lng: 0 };
+    const initialVehicles = bootstrap.vehicles || [];
+    const initialTimestamp = bootstrap.generationTime || new Date().toISOString();
+    const trafficUrl = bootstrap.trafficUrl || "/api/traffic/";
+    const vehicleStreamUrl = bootstrap.vehicleStreamUrl || null;
+    const initialGeofences = bootstrap.geofences || [];
+    const initialDepots = bootstrap.depots || [];
+    const routeCatalog = bootstrap.routeCatalog || [];
+    const initialLegend = bootstrap.legend || {};
     const legendData =
         initialLegend && Object.keys(initialLegend).length
             ? initialLegend
@@ -57,7 +56,7 @@
                       color: fence.color,
                       })),
               };
-    const mapTilesConfig = parseJSONContent("map-tiles-config") || {};
+    const mapTilesConfig = bootstrap.mapTiles || {};
     const tileProviders = mapTilesConfig.providers || {};
     const availableProviders = Object.keys(tileProviders);
     if (!availableProviders.length) {
@@ -985,13 +984,56 @@
         } catch (error) {
             console.warn("Vehicle poll failed; retrying later.", error);
         } finally {
+            window.clearTimeout(pollTimeoutId);
+            pollTimeoutId = vehicleStream
+                ? null
+                : window.setTimeout(pollVehicles, POLL_INTERVAL_MS);
+        }
+    }
+
+    let vehicleStream = null;
+
+    function applyVehicleDelta(payload) {
+        // The first event after (re)connecting carries the whole fleet.
+        const byUid = new Map(
+            payload.reset ? [] : latestVehicles.map((vehicle) => [vehicle.uid, vehicle])
+        );
+        (payload.removed || []).forEach((uid) => byUid.delete(uid));
+        // Changed vehicles arrive as partial records: merge them.
+        (payload.vehicles || []).forEach((vehicle) =>
+            byUid.set(vehicle.uid, { ...byUid.get(vehicle.uid), ...vehicle })
+        );
+        latestVehicles = Array.from(byUid.values());
+        refreshInterface(payload.timestamp);
+    }
+
+    function startVehicleUpdates() {
+        if (!vehicleStreamUrl || !window.EventSource) {
             pollTimeoutId = window.setTimeout(pollVehicles, POLL_INTERVAL_MS);
+            return;
         }
+        let received = false;
+        vehicleStream = new EventSource(vehicleStreamUrl);
+        vehicleStream.addEventListener("vehicles", (event) => {
+            received = true;
+            window.clearTimeout(pollTimeoutId);
+            applyVehicleDelta(JSON.parse(event.data));
+        });
+        vehicleStream.addEventListener("error", () => {
+            // Ended by the server's lifetime cap, dropped, or unavailable:
+            // poll meanwhile, and reconnect only a stream that was working.
+            vehicleStream.close();
+            vehicleStream = null;
+            pollVehicles();
+            if (received) {
+                window.setTimeout(startVehicleUpdates, POLL_INTERVAL_MS);
+            }
+        });
     }
 
     async function pollTraffic() {
         try {
-            const response = await fetch("/api/traffic/");
+            const response = await fetch(trafficUrl);
             if (!response.ok) {
                 throw new Error(`Bad response: ${response.status}`);
             }
@@ -1013,9 +1055,8 @@
     registerFilters();
     registerSearch();
     refreshInterface(initialTimestamp);
-    renderTraffic(initialTrafficFeatures);
-    updateTrafficMeta(initialTrafficMeta);
-    pollTimeoutId = window.setTimeout(pollVehicles, POLL_INTERVAL_MS);
+    pollTraffic();
+    startVehicleUpdates();
     let selectingStart = true;
     let startCoords = null;
     let endCoords = null;
@@ -1138,6 +1179,9 @@
     loadIdleVehicles(); // Initial load
 
     window.addEventListener("beforeunload", () => {
+        if (vehicleStream) {
+            vehicleStream.close();
+        }
         if (pollTimeoutId) {
             window.clearTimeout(pollTimeoutId);
         }
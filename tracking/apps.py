@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TrackingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracking'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+    def warm_up(self):
+        """
+        Pay for the route graph and the JIT-compiled search at start-up
+        rather than on the first /find-route/ request. Called from the
+        server entry points, not ready(), so management commands, tests and
+        serverless cold starts keep the graph lazy.
+        """
+        if getattr(settings, "WARM_ROUTE_GRAPH", False):
+            from .pathfinder import warm_route_graph
+            from .services import ROUTE_DEFINITIONS
+
+            warm_route_graph(ROUTE_DEFINITIONS)
@@ -8,3 +8,15 @@ class VehicleForm(forms.ModelForm):
             'name', 'license_plate', 'vin', 'make', 'model', 'year', 
             'status', 'driver_name', 'driver_phone', 'driver_license', 'is_disabled'
         )
+
+
+class RouteParamsForm(forms.Form):
+    start_lat = forms.FloatField(min_value=-90, max_value=90)
+    start_lng = forms.FloatField(min_value=-180, max_value=180)
+    end_lat = forms.FloatField(min_value=-90, max_value=90)
+    end_lng = forms.FloatField(min_value=-180, max_value=180)
+
+    def coordinates(self):
+        """``(start_lat, start_lng, end_lat, end_lng)`` from a valid form."""
+        data = self.cleaned_data
+        return data['start_lat'], data['start_lng'], data['end_lat'], data['end_lng']
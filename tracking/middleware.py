@@ -0,0 +1,14 @@
+from django.middleware.gzip import GZipMiddleware as BaseGZipMiddleware
+
+
+class GZipMiddleware(BaseGZipMiddleware):
+    """
+    GZipMiddleware that leaves server-sent event streams alone: its streaming
+    compressor never flushes, so events would reach the client late or cut
+    off mid-event.
+    """
+
+    def process_response(self, request, response):
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-15 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0007_route_vehicle_assigned_route'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(fields=['status', 'assigned_route'], name='veh_status_route_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('is_disabled', False)), fields=['status'], name='veh_active_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+import json
+
+from django.db import migrations, models
+
+
+def copy_path_to_json(apps, schema_editor):
+    Route = apps.get_model('tracking', 'Route')
+    for route in Route.objects.all():
+        try:
+            route.path_points = json.loads(route.path or '[]')
+        except json.JSONDecodeError:
+            route.path_points = []
+        route.save(update_fields=['path_points'])
+
+
+def copy_path_to_text(apps, schema_editor):
+    Route = apps.get_model('tracking', 'Route')
+    for route in Route.objects.all():
+        route.path = json.dumps(route.path_points)
+        route.save(update_fields=['path'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracking', '0008_vehicle_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='path_points',
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(copy_path_to_json, copy_path_to_text),
+        migrations.RemoveField(
+            model_name='route',
+            name='path',
+        ),
+        migrations.RenameField(
+            model_name='route',
+            old_name='path_points',
+            new_name='path',
+        ),
+    ]
@@ -2,7 +2,7 @@ from django.db import models
 
 class Route(models.Model):
     name = models.CharField(max_length=100)
-    path = models.TextField()  # Storing the route as a JSON string of coordinates
+    path = models.JSONField(default=list)  # List of [lat, lng] coordinate pairs
 
     def __str__(self):
         return self.name
@@ -28,5 +28,12 @@ class Vehicle(models.Model):
     driver_license = models.CharField(max_length=50, blank=True, default='')
     assigned_route = models.ForeignKey(Route, on_delete=models.SET_NULL, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'assigned_route'], name='veh_status_route_idx'),
+            # Partial index: the map and dispatch queries only read enabled vehicles.
+            models.Index(fields=['status'], name='veh_active_idx', condition=models.Q(is_disabled=False)),
+        ]
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
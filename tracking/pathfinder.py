@@ -1,65 +1,493 @@
+import functools
 import heapq
-from shapely.geometry import LineString, Point
-from .services import decode_polyline6, haversine_km
+import math
+import multiprocessing
+import numpy as np
+import shapely
+from shapely.geometry import LineString
+from shapely.ops import unary_union
+from shapely.strtree import STRtree
+from .services import EARTH_RADIUS_KM, NUMBA_AVAILABLE, decode_polyline6, njit, segment_lengths_km
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # SciPy is optional; nearest_node scans the nodes instead.
+    cKDTree = None
 
 class Graph:
+    __slots__ = ("nodes", "edges", "coords", "node_ids", "_derived")
+
     def __init__(self):
         self.nodes = set()
         self.edges = {}
-        self.distances = {}
+        self.coords = []
+        self.node_ids = {}
+        # Arrays derived from the topology (CSR, node index); reset on change.
+        self._derived = {}
 
     def add_node(self, value):
         self.nodes.add(value)
         if value not in self.edges:
             self.edges[value] = []
 
+    def intern(self, coord):
+        """
+        Return the integer node id for ``coord``, adding the node if needed.
+        """
+        node = self.node_ids.get(coord)
+        if node is None:
+            node = len(self.coords)
+            self.node_ids[coord] = node
+            self.coords.append(coord)
+            self.add_node(node)
+            self._derived.clear()
+        return node
+
     def add_edge(self, from_node, to_node, distance):
-        self.edges[from_node].append(to_node)
-        self.distances[(from_node, to_node)] = distance
+        self.edges[from_node].append((to_node, distance))
+        self._derived.clear()
+
+    def derived(self, name, build):
+        """
+        Return the cached result of ``build(self)`` stored under ``name``;
+        it is rebuilt after the next node or edge is added.
+        """
+        value = self._derived.get(name)
+        if value is None:
+            value = self._derived[name] = build(self)
+        return value
+
+    def to_csr(self):
+        """
+        Flatten the adjacency lists into CSR ``(indptr, indices, weights)``
+        arrays indexed by node id.
+        """
+        node_count = len(self.coords)
+        indptr = np.zeros(node_count + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum([len(self.edges[node]) for node in range(node_count)])
+
+        indices = np.empty(indptr[-1], dtype=np.int32)
+        weights = np.empty(indptr[-1], dtype=np.float64)
+        offset = 0
+        for node in range(node_count):
+            for neighbor, distance in self.edges[node]:
+                indices[offset] = neighbor
+                weights[offset] = distance
+                offset += 1
+
+        return indptr, indices, weights
+
+# Heap entries are packed into a single int, ``scaled_cost << 32 | node``,
+# so the queues hold ints instead of allocating a (cost, node) tuple per push.
+# Costs keep 0.1 m resolution; exact distances live in the visited dicts.
+HEAP_COST_SCALE = 10_000
+NODE_MASK = 0xFFFFFFFF
+
+def _pack(cost, node):
+    return int(cost * HEAP_COST_SCALE) << 32 | node
 
 def astar(graph, start, end, heuristic):
-    priority_queue = [(0, start)]
+    priority_queue = [_pack(0, start)]
     visited = {start: 0}
     path = {}
 
     while priority_queue:
-        current_cost, current_node = heapq.heappop(priority_queue)
+        current_node = heapq.heappop(priority_queue) & NODE_MASK
 
         if current_node == end:
             break
 
-        for neighbor in graph.edges[current_node]:
-            cost = graph.distances[(current_node, neighbor)]
+        for neighbor, cost in graph.edges[current_node]:
             new_cost = visited[current_node] + cost
             if neighbor not in visited or new_cost < visited[neighbor]:
                 visited[neighbor] = new_cost
                 priority = new_cost + heuristic(neighbor, end)
-                heapq.heappush(priority_queue, (priority, neighbor))
+                heapq.heappush(priority_queue, _pack(priority, neighbor))
+                path[neighbor] = current_node
+
+    return visited, path
+
+def dijkstra(graph, initial):
+    priority_queue = [_pack(0, initial)]
+    visited = {initial: 0}
+    path = {}
+
+    while priority_queue:
+        entry = heapq.heappop(priority_queue)
+        current_node = entry & NODE_MASK
+        current_cost = visited[current_node]
+
+        # Lazy deletion: stale queue entries are skipped instead of decreased.
+        if entry > _pack(current_cost, current_node):
+            continue
+
+        for neighbor, cost in graph.edges[current_node]:
+            new_cost = current_cost + cost
+            if neighbor not in visited or new_cost < visited[neighbor]:
+                visited[neighbor] = new_cost
                 path[neighbor] = current_node
+                heapq.heappush(priority_queue, _pack(new_cost, neighbor))
 
     return visited, path
 
+def bidirectional_dijkstra(graph, start, end):
+    """
+    Point-to-point Dijkstra that searches from both ends and stops once the
+    two frontiers can no longer improve on the best meeting point. Edges are
+    assumed symmetric, as build_graph_from_routes adds both directions.
+
+    Returns ``(distance, [nodes...])`` or ``(None, [])`` if unreachable.
+    """
+    if start == end:
+        return 0, [start]
+
+    forward = ({start: 0}, {}, [_pack(0, start)])
+    backward = ({end: 0}, {}, [_pack(0, end)])
+    best = math.inf
+    meeting = None
+
+    while forward[2] and backward[2]:
+        # Packed costs are truncated, so this bound errs towards searching on.
+        frontier = (forward[2][0] >> 32) + (backward[2][0] >> 32)
+        if frontier / HEAP_COST_SCALE >= best:
+            break
+
+        if forward[2][0] <= backward[2][0]:
+            side, other = forward, backward
+        else:
+            side, other = backward, forward
+        visited, path, priority_queue = side
+        entry = heapq.heappop(priority_queue)
+        current_node = entry & NODE_MASK
+        current_cost = visited[current_node]
+
+        if entry > _pack(current_cost, current_node):
+            continue
+
+        for neighbor, cost in graph.edges[current_node]:
+            new_cost = current_cost + cost
+            if neighbor not in visited or new_cost < visited[neighbor]:
+                visited[neighbor] = new_cost
+                path[neighbor] = current_node
+                heapq.heappush(priority_queue, _pack(new_cost, neighbor))
+            if neighbor in other[0] and visited[neighbor] + other[0][neighbor] < best:
+                best = visited[neighbor] + other[0][neighbor]
+                meeting = neighbor
+
+    if meeting is None:
+        return None, []
+
+    route = [meeting]
+    while route[-1] != start:
+        route.append(forward[1][route[-1]])
+    route.reverse()
+    while route[-1] != end:
+        route.append(backward[1][route[-1]])
+    return best, route
+
+# The CSR search uses a 4-ary heap: shallower than a binary heap, so pushes
+# (the common operation during relaxation) sift through fewer levels.
+HEAP_ARITY = 4
+
+@njit(cache=True)
+def _heap_push(keys, values, size, key, value):
+    index = size
+    while index > 0:
+        parent = (index - 1) // HEAP_ARITY
+        if keys[parent] <= key:
+            break
+        keys[index] = keys[parent]
+        values[index] = values[parent]
+        index = parent
+    keys[index] = key
+    values[index] = value
+    return size + 1
+
+@njit(cache=True)
+def _heap_pop(keys, values, size):
+    key = keys[0]
+    value = values[0]
+    size -= 1
+    last_key = keys[size]
+    last_value = values[size]
+    index = 0
+    while True:
+        first_child = HEAP_ARITY * index + 1
+        if first_child >= size:
+            break
+        smallest = first_child
+        for child in range(first_child + 1, min(first_child + HEAP_ARITY, size)):
+            if keys[child] < keys[smallest]:
+                smallest = child
+        if keys[smallest] >= last_key:
+            break
+        keys[index] = keys[smallest]
+        values[index] = values[smallest]
+        index = smallest
+    keys[index] = last_key
+    values[index] = last_value
+    return key, value, size
+
+@njit(cache=True)
+def dijkstra_csr(indptr, indices, weights, src, dst):
+    """
+    Lazy Dijkstra over CSR arrays; stops early once ``dst`` is settled.
+
+    Pass ``dst=-1`` to search the whole graph. Returns ``(dist, prev)``
+    arrays indexed by node id, with ``inf``/``-1`` for unreachable nodes.
+    """
+    node_count = indptr.shape[0] - 1
+    dist = np.full(node_count, np.inf)
+    prev = np.full(node_count, -1, dtype=np.int32)
+    # Each relaxation pushes at most once, so E + 1 slots always suffice.
+    heap_keys = np.empty(indices.shape[0] + 1, dtype=np.float64)
+    heap_values = np.empty(indices.shape[0] + 1, dtype=np.int32)
+
+    dist[src] = 0.0
+    size = _heap_push(heap_keys, heap_values, 0, 0.0, src)
+    while size > 0:
+        current_cost, current_node, size = _heap_pop(heap_keys, heap_values, size)
+        if current_cost > dist[current_node]:
+            continue
+        if current_node == dst:
+            break
+        for edge in range(indptr[current_node], indptr[current_node + 1]):
+            neighbor = indices[edge]
+            new_cost = current_cost + weights[edge]
+            if new_cost < dist[neighbor]:
+                dist[neighbor] = new_cost
+                prev[neighbor] = current_node
+                size = _heap_push(heap_keys, heap_values, size, new_cost, neighbor)
+
+    return dist, prev
+
+@njit(cache=True)
+def _reconstruct_csr_path(prev, target):
+    length = 1
+    node = target
+    while prev[node] != -1:
+        node = prev[node]
+        length += 1
+    route = np.empty(length, dtype=np.int32)
+    node = target
+    for index in range(length - 1, -1, -1):
+        route[index] = node
+        node = prev[node]
+    return route
+
+def shortest_path(graph, start, end):
+    """
+    Return ``(distance_km, [coords...])`` between two graph coordinates, or
+    ``(None, [])`` when ``end`` is unreachable.
+    """
+    source = graph.node_ids[start]
+    target = graph.node_ids[end]
+
+    if NUMBA_AVAILABLE:
+        indptr, indices, weights = graph.derived("csr", Graph.to_csr)
+        dist, prev = dijkstra_csr(indptr, indices, weights, source, target)
+        if not np.isfinite(dist[target]):
+            return None, []
+        distance = float(dist[target])
+        route = _reconstruct_csr_path(prev, target).tolist()
+    else:
+        distance, route = bidirectional_dijkstra(graph, source, target)
+        if distance is None:
+            return None, []
+
+    return distance, [graph.coords[node] for node in route]
+
+def _node_index(graph):
+    """
+    Per-node arrays for nearest-node queries: radians and cos(lat) for the
+    exact haversine scan, plus, with SciPy, a cKDTree over coordinates
+    projected equirectangularly around the mean latitude.
+    """
+    coords = np.asarray(graph.coords, dtype=np.float64).reshape(-1, 2)
+    radians = np.radians(coords)
+    tree = scale = None
+    if cKDTree is not None:
+        scale = np.array([1.0, math.cos(radians[:, 0].mean())])
+        tree = cKDTree(coords * scale)
+    return radians[:, 0], radians[:, 1], np.cos(radians[:, 0]), tree, scale
+
+def nearest_node(graph, lat, lng, max_km=None):
+    """
+    Return the id of the graph node closest to ``(lat, lng)``, or None when
+    ``max_km`` is given and that node is further away.
+    """
+    lat_rad, lng_rad, cos_lat, tree, scale = graph.derived("node_index", _node_index)
+    if tree is not None:
+        degrees, node = tree.query(np.array([lat, lng]) * scale)
+        distance_km = math.radians(degrees) * EARTH_RADIUS_KM
+    else:
+        # argmin of the haversine term is the argmin of the distance itself.
+        phi = math.radians(lat)
+        a = (
+            np.sin((lat_rad - phi) / 2) ** 2
+            + math.cos(phi) * cos_lat * np.sin((lng_rad - math.radians(lng)) / 2) ** 2
+        )
+        node = np.argmin(a)
+        distance_km = 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a[node], 1.0)))
+    if max_km is not None and distance_km > max_km:
+        return None
+    return int(node)
+
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Decoding is farmed out to worker processes only for large route sets;
+# below this the pool start-up cost outweighs the work.
+PARALLEL_DECODE_MIN_ROUTES = 64
+
+def _find_junctions(lines):
+    """
+    Collect, per polyline, the points where it meets another polyline.
+    unary_union nodes the whole network in one pass; the ends of the noded
+    pieces are the junctions, matched back to their polylines in a single
+    vectorised STRtree query.
+    """
+    merged = unary_union(lines)
+    ends = list({
+        point
+        for part in shapely.get_parts(merged)
+        for point in (part.coords[0], part.coords[-1])
+    })
+    if not ends:
+        return [set() for _ in lines]
+
+    # One batched GEOS query for every (junction, polyline) pair.
+    tree = STRtree(lines)
+    point_index, line_index = tree.query(
+        shapely.points(ends), predicate="dwithin", distance=1e-9
+    )
+    junctions = [set() for _ in lines]
+    for point, line in zip(point_index.tolist(), line_index.tolist()):
+        junctions[line].add(ends[point])
+    return junctions
+
+def _splice_junctions(polyline, line, junctions):
+    """
+    Insert junction points that are not already vertices of the polyline.
+    Each junction is located along the line once and slotted in between the
+    vertices around it, so edges only ever join neighbours in line order.
+    """
+    extra = list(junctions.difference(polyline))
+    if not extra:
+        return polyline
+
+    points = np.asarray(polyline)
+    steps = np.hypot(*np.diff(points, axis=0).T)
+    offsets = np.concatenate(([0.0], np.cumsum(steps)))
+    positions = shapely.line_locate_point(line, shapely.points(extra))
+    order = np.argsort(positions, kind="stable")
+    slots = np.searchsorted(offsets, positions[order], side="right")
+
+    spliced = []
+    previous = 0
+    for slot, index in zip(slots.tolist(), order.tolist()):
+        spliced.extend(polyline[previous:slot])
+        spliced.append(extra[index])
+        previous = slot
+    spliced.extend(polyline[previous:])
+    return spliced
+
+def _decode_route(route):
+    # Routes loaded from the database already carry decoded points.
+    if "points" in route:
+        return [tuple(point) for point in np.asarray(route["points"], dtype=float).tolist()]
+    return decode_polyline6(route["polyline"])
+
 def build_graph_from_routes(route_definitions):
     graph = Graph()
-    polylines = []
-    for route in route_definitions:
-        decoded_polyline = decode_polyline6(route["polyline"])
-        for point in decoded_polyline:
-            graph.add_node(point)
-        polylines.append(LineString(decoded_polyline))
+    if len(route_definitions) >= PARALLEL_DECODE_MIN_ROUTES:
+        with multiprocessing.Pool() as pool:
+            polylines = pool.map(_decode_route, route_definitions)
+    else:
+        polylines = [_decode_route(route) for route in route_definitions]
+    lines = [LineString(polyline) for polyline in polylines]
+    junctions = _find_junctions(lines)
 
-    logger.info(f"Number of nodes in graph: {len(graph.nodes)}")
+    # Routes overlap on shared roads, so the same segment can appear twice.
+    linked = set()
+    for index, polyline in enumerate(polylines):
+        polyline = _splice_junctions(polyline, lines[index], junctions[index])
+        node_ids = [graph.intern(point) for point in polyline]
 
-    for polyline in polylines:
-        for i in range(len(polyline.coords) - 1):
-            node1 = polyline.coords[i]
-            node2 = polyline.coords[i+1]
-            distance = haversine_km(node1, node2)
+        distances = segment_lengths_km(polyline).tolist()
+        for node1, node2, distance in zip(node_ids, node_ids[1:], distances):
+            # Repeated vertices would only add zero-length self-loops.
+            if node1 == node2 or (node1, node2) in linked:
+                continue
+            linked.add((node1, node2))
+            linked.add((node2, node1))
             graph.add_edge(node1, node2, distance)
             graph.add_edge(node2, node1, distance)
 
+    logger.info(f"Number of nodes in graph: {len(graph.nodes)}")
+
     return graph
+
+def _route_key(route):
+    if "points" in route:
+        points = np.asarray(route["points"], dtype=float).tolist()
+        return route.get("id"), tuple(tuple(point) for point in points)
+    return route.get("id"), route["polyline"]
+
+@functools.lru_cache(maxsize=8)
+def _cached_graph(routes_key):
+    route_definitions = []
+    for route_id, source in routes_key:
+        field = "points" if isinstance(source, tuple) else "polyline"
+        route_definitions.append({"id": route_id, field: source})
+    return build_graph_from_routes(route_definitions)
+
+def get_route_graph(route_definitions):
+    """
+    Return the graph for ``route_definitions``, building it only the first
+    time a given set of routes is seen. The graph is shared; do not mutate it.
+    """
+    return _cached_graph(tuple(_route_key(route) for route in route_definitions))
+
+def warm_route_graph(route_definitions):
+    """
+    Build the shared graph for ``route_definitions`` along with its CSR
+    arrays and nearest-node index, and run one search so the compiled
+    kernels are loaded before the first route request needs them.
+    """
+    graph = get_route_graph(route_definitions)
+    if not graph.coords:
+        return
+    origin = graph.coords[nearest_node(graph, *graph.coords[0])]
+    shortest_path(graph, origin, origin)
+
+def clear_route_graph_cache():
+    _cached_graph.cache_clear()
+    _cached_network_route.cache_clear()
+
+@functools.lru_cache(maxsize=256)
+def _cached_network_route(routes_key, source, target):
+    graph = _cached_graph(routes_key)
+    return shortest_path(graph, graph.coords[source], graph.coords[target])
+
+# Endpoints further than this from every route are not snapped onto one.
+NETWORK_SNAP_MAX_KM = 0.3
+
+def find_network_route(route_definitions, start, end, max_snap_km=NETWORK_SNAP_MAX_KM):
+    """
+    Snap ``start`` and ``end`` (lat, lng) to the nearest nodes of the shared
+    route graph and return ``(distance_km, [coords...])`` between them, or
+    ``(None, [])`` when either is more than ``max_snap_km`` from the network
+    or they are not connected. Results are cached per node pair until the
+    route graph cache is cleared.
+    """
+    routes_key = tuple(_route_key(route) for route in route_definitions)
+    graph = _cached_graph(routes_key)
+    if not graph.coords:
+        return None, []
+    source = nearest_node(graph, *start, max_km=max_snap_km)
+    target = nearest_node(graph, *end, max_km=max_snap_km)
+    if source is None or target is None:
+        return None, []
+    return _cached_network_route(routes_key, source, target)
@@ -4,170 +4,45 @@ geometry.
 """
 from __future__ import annotations
 
-import bisect
-import math
+import functools
+import hashlib
+import json
+import os
 import random
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
 from datetime import datetime, timezone
-from typing import Dict, List, Sequence, Tuple
-
-from .models import Vehicle
-
-
-BASE_LOCATION: Tuple[float, float] = (23.8103, 90.4125)  # Dhaka, Bangladesh
-EARTH_RADIUS_KM = 6371.0088
-
-
-def _matmul(a: List[List[float]], b: List[List[float]]) -> List[List[float]]:
-    return [
-        [
-            sum(a[i][k] * b[k][j] for k in range(len(b)))
-            for j in range(len(b[0]))
-        ]
-        for i in range(len(a))
-    ]
-
-
-def _transpose(matrix: List[List[float]]) -> List[List[float]]:
-    return [list(row) for row in zip(*matrix)]
-
-
-def _identity(size: int) -> List[List[float]]:
-    return [[1.0 if i == j else 0.0 for j in range(size)] for i in range(size)]
-
-
-def _invert_2x2(matrix: List[List[float]]) -> List[List[float]]:
-    a, b = matrix[0]
-    c, d = matrix[1]
-    det = a * d - b * c
-    if abs(det) < 1e-12:
-        # Fall back to pseudo-inverse with small regularisation.
-        det = 1e-12
-    inv_det = 1.0 / det
-    return [[d * inv_det, -b * inv_det], [-c * inv_det, a * inv_det]]
+from types import MappingProxyType
+from typing import DefaultDict, Dict, List, Mapping, Sequence, Tuple
 
+import numpy as np
 
-class KalmanFilter2D:
-    """
-    Lightweight constant-velocity Kalman filter for smoothing GPS traces.
-    """
-
-    def __init__(
-        self,
-        process_variance: float = 5e-7,
-        measurement_variance: float = 2e-6,
-    ):
-        self.process_variance = process_variance
-        self.measurement_variance = measurement_variance
-        self.state: List[float] | None = None  # [lat, lng, v_lat, v_lng]
-        self.covariance: List[List[float]] | None = None
-        self.last_timestamp: float | None = None
-
-    def step(self, timestamp: float, lat: float, lng: float) -> Tuple[float, float]:
-        if self.state is None or self.covariance is None:
-            self.state = [lat, lng, 0.0, 0.0]
-            self.covariance = [
-                [1e-3, 0.0, 0.0, 0.0],
-                [0.0, 1e-3, 0.0, 0.0],
-                [0.0, 0.0, 1e-2, 0.0],
-                [0.0, 0.0, 0.0, 1e-2],
-            ]
-            self.last_timestamp = timestamp
-            return lat, lng
-
-        dt = max(timestamp - (self.last_timestamp or timestamp), 1.0)
-        self.last_timestamp = timestamp
-        self._predict(dt)
-        return self._update(lat, lng)
-
-    def _predict(self, dt: float) -> None:
-        if self.state is None or self.covariance is None:
-            return
-
-        # State transition.
-        lat, lng, v_lat, v_lng = self.state
-        lat += dt * v_lat
-        lng += dt * v_lng
-        self.state = [lat, lng, v_lat, v_lng]
-
-        # Transition matrix.
-        A = [
-            [1.0, 0.0, dt, 0.0],
-            [0.0, 1.0, 0.0, dt],
-            [0.0, 0.0, 1.0, 0.0],
-            [0.0, 0.0, 0.0, 1.0],
-        ]
-        AT = _transpose(A)
-
-        AP = _matmul(A, self.covariance)
-        APA_T = _matmul(AP, AT)
-
-        dt2 = dt * dt
-        dt3 = dt2 * dt
-        dt4 = dt3 * dt
-        q = self.process_variance
-        Q = [
-            [0.25 * dt4 * q, 0.0, 0.5 * dt3 * q, 0.0],
-            [0.0, 0.25 * dt4 * q, 0.0, 0.5 * dt3 * q],
-            [0.5 * dt3 * q, 0.0, dt2 * q, 0.0],
-            [0.0, 0.5 * dt3 * q, 0.0, dt2 * q],
-        ]
-
-        self.covariance = [
-            [
-                APA_T[row][col] + Q[row][col]
-                for col in range(4)
-            ]
-            for row in range(4)
-        ]
+from .models import Vehicle
 
-    def _update(self, lat: float, lng: float) -> Tuple[float, float]:
-        if self.state is None or self.covariance is None:
-            return lat, lng
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional; decorated helpers stay plain Python.
+    NUMBA_AVAILABLE = False
 
-        H = [
-            [1.0, 0.0, 0.0, 0.0],
-            [0.0, 1.0, 0.0, 0.0],
-        ]
-        HT = _transpose(H)
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
 
-        HP = _matmul(H, self.covariance)
-        S = _matmul(HP, HT)
-        R = [
-            [self.measurement_variance, 0.0],
-            [0.0, self.measurement_variance],
-        ]
-        S = [
-            [S[row][col] + R[row][col] for col in range(2)]
-            for row in range(2)
-        ]
-        S_inv = _invert_2x2(S)
+try:
+    import orjson
+except ImportError:  # orjson is optional; dumps_json falls back to the stdlib.
+    orjson = None
 
-        PHt = _matmul(self.covariance, HT)
-        K = _matmul(PHt, S_inv)  # 4x2
-
-        residual = [
-            lat - self.state[0],
-            lng - self.state[1],
-        ]
-        self.state = [
-            self.state[i]
-            + K[i][0] * residual[0]
-            + K[i][1] * residual[1]
-            for i in range(4)
-        ]
 
-        KH = _matmul(K, H)
-        I = _identity(4)
-        I_minus_KH = [
-            [
-                I[row][col] - KH[row][col]
-                for col in range(4)
-            ]
-            for row in range(4)
-        ]
-        self.covariance = _matmul(I_minus_KH, self.covariance)
-
-        return self.state[0], self.state[1]
+BASE_LOCATION: Tuple[float, float] = (23.8103, 90.4125)  # Dhaka, Bangladesh
+EARTH_RADIUS_KM = 6371.0088
+KALMAN_PROCESS_VARIANCE = 5e-7
+KALMAN_MEASUREMENT_VARIANCE = 2e-6
 
 
 # Polylines were generated via OSRM (polyline6 encoding) for well-known Dhaka corridors.
@@ -274,147 +149,370 @@ DEPOTS: Sequence[Dict[str, object]] = [
 ]
 
 
-def decode_polyline6(polyline: str) -> List[Tuple[float, float]]:
+def decode_polyline6(polyline: str | bytes | memoryview) -> List[Tuple[float, float]]:
+    """
+    Decode a polyline6 string into a list of (lat, lng) coordinates. ASCII
+    bytes or a memoryview over them are read in place without copying.
+
+    Every character is decoded at once with NumPy: 5-bit chunks are shifted
+    into place by their position within each value, and reduceat sums the
+    chunks of each value (the bit ranges never overlap, so sum == OR).
+    """
+    if not polyline:
+        return []
+
+    if isinstance(polyline, str):
+        polyline = polyline.encode("ascii")
+    chunks = np.frombuffer(polyline, dtype=np.uint8).astype(np.int64) - 63
+    terminators = chunks < 0x20
+    if not terminators[-1]:
+        raise ValueError("Invalid polyline: buffer exhausted.")
+
+    starts = np.flatnonzero(np.concatenate(([True], terminators[:-1])))
+    if len(starts) % 2:
+        raise ValueError("Invalid polyline: buffer exhausted.")
+    value_index = np.cumsum(np.concatenate(([0], terminators[:-1])))
+    shifts = 5 * (np.arange(len(chunks)) - starts[value_index])
+    values = np.add.reduceat((chunks & 0x1F) << shifts, starts)
+
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    lat = np.cumsum(deltas[0::2]) * 1e-6
+    lng = np.cumsum(deltas[1::2]) * 1e-6
+    return list(zip(lat.tolist(), lng.tolist()))
+
+
+def segment_lengths_km(points: Sequence[Tuple[float, float]]) -> np.ndarray:
     """
-    Decode a polyline6 string into a list of (lat, lng) coordinates.
+    Vectorised haversine distance between consecutive (lat, lng) points.
+    Returns an array with one length in kilometres per segment.
     """
-    coordinates: List[Tuple[float, float]] = []
-    index = 0
-    lat = 0
-    lng = 0
-    factor = 1e-6
+    radians = np.radians(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+    lat = radians[:, 0]
+    d_lat = np.diff(lat)
+    d_lng = np.diff(radians[:, 1])
+    a = (
+        np.sin(d_lat / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(d_lng / 2) ** 2
+    )
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
 
-    while index < len(polyline):
-        lat_change, index = _decode_value(polyline, index)
-        lng_change, index = _decode_value(polyline, index)
-        lat += lat_change
-        lng += lng_change
-        coordinates.append((lat * factor, lng * factor))
 
-    return coordinates
+def _json_default(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
 
 
-def _decode_value(polyline: str, index: int) -> Tuple[int, int]:
-    result = 0
-    shift = 0
+def dumps_json(value) -> str:
+    """
+    Encode a payload with orjson when installed, otherwise the stdlib
+    encoder; NumPy arrays and scalars are accepted either way.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    return json.dumps(value, default=_json_default)
 
-    while True:
-        if index >= len(polyline):
-            raise ValueError("Invalid polyline: buffer exhausted.")
-        b = ord(polyline[index]) - 63
-        index += 1
-        result |= (b & 0x1F) << shift
-        shift += 5
-        if b < 0x20:
-            break
 
-    delta = ~(result >> 1) if (result & 1) else (result >> 1)
-    return delta, index
+ROUTE_CACHE_DIR = os.environ.get("VTM_ROUTE_CACHE_DIR", tempfile.gettempdir())
 
 
-def haversine_km(start: Tuple[float, float], end: Tuple[float, float]) -> float:
-    """
-    Compute the great-circle distance between two coordinates in kilometres.
-    """
-    lat1, lng1 = map(math.radians, start)
-    lat2, lng2 = map(math.radians, end)
-    d_lat = lat2 - lat1
-    d_lng = lng2 - lng1
-    a = (
-        math.sin(d_lat / 2) ** 2
-        + math.cos(lat1) * math.cos(lat2) * math.sin(d_lng / 2) ** 2
-    )
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return EARTH_RADIUS_KM * c
+def _route_cache_path() -> str:
+    payload = json.dumps(list(ROUTE_DEFINITIONS), sort_keys=True).encode("utf-8")
+    digest = hashlib.sha1(payload).hexdigest()[:16]
+    return os.path.join(ROUTE_CACHE_DIR, f"vtm_routes_{digest}.npz")
 
 
-def _bearing_deg(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-    """
-    Compute forward azimuth in degrees from point 1 to point 2.
+def _compute_route_geometry() -> Dict[str, np.ndarray]:
+    points: List[np.ndarray] = []
+    cumulative: List[np.ndarray] = []
+    offsets = [0]
+    for definition in ROUTE_DEFINITIONS:
+        coords = np.asarray(
+            decode_polyline6(definition["polyline"]), dtype=np.float64
+        ).reshape(-1, 2)
+        if len(coords):
+            points.append(coords)
+            cumulative.append(
+                np.concatenate(([0.0], np.cumsum(segment_lengths_km(coords))))
+            )
+        offsets.append(offsets[-1] + len(coords))
+    return {
+        "points": np.concatenate(points) if points else np.empty((0, 2)),
+        "cumulative": np.concatenate(cumulative) if cumulative else np.empty(0),
+        "offsets": np.asarray(offsets, dtype=np.int64),
+    }
+
+
+def _load_route_geometry() -> Dict[str, np.ndarray]:
     """
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    d_lambda = math.radians(lng2 - lng1)
+    Decoded points and cumulative distances for every route definition,
+    concatenated in definition order and sliced apart by ``offsets``.
 
-    x = math.sin(d_lambda) * math.cos(phi2)
-    y = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(
-        d_lambda
-    )
-    bearing = math.degrees(math.atan2(x, y))
-    return (bearing + 360) % 360
+    The arrays are cached in an npz keyed by a hash of ROUTE_DEFINITIONS so
+    each worker process only pays for decoding once per definition change.
+    A missing, stale or unwritable cache falls back to decoding in-process.
+    """
+    path = _route_cache_path()
+    try:
+        with np.load(path) as archive:
+            geometry = {key: archive[key] for key in ("points", "cumulative", "offsets")}
+        if len(geometry["offsets"]) == len(ROUTE_DEFINITIONS) + 1:
+            return geometry
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    geometry = _compute_route_geometry()
+    try:
+        # Write under a unique name and rename so concurrent workers never
+        # observe a half-written archive.
+        handle, partial = tempfile.mkstemp(dir=ROUTE_CACHE_DIR, suffix=".npz")
+        with os.fdopen(handle, "wb") as stream:
+            np.savez(stream, **geometry)
+        os.replace(partial, path)
+    except OSError:
+        pass
+    return geometry
 
 
 def _build_routes() -> List[Dict]:
     routes: List[Dict] = []
-    for definition in ROUTE_DEFINITIONS:
-        coords = decode_polyline6(definition["polyline"])
-        if not coords:
+    geometry = _load_route_geometry()
+    offsets = geometry["offsets"].tolist()
+    for index, definition in enumerate(ROUTE_DEFINITIONS):
+        start, stop = offsets[index], offsets[index + 1]
+        if start == stop:
             continue
+        coords = np.ascontiguousarray(geometry["points"][start:stop])
+        cumulative = np.ascontiguousarray(geometry["cumulative"][start:stop])
 
-        point_dicts = [{"lat": round(lat, 6), "lng": round(lng, 6)} for lat, lng in coords]
-        cumulative: List[float] = [0.0]
-        for start, end in zip(coords[:-1], coords[1:]):
-            cumulative.append(cumulative[-1] + haversine_km(start, end))
-
-        length_km = cumulative[-1] if cumulative else 0.0
+        point_dicts = [
+            {"lat": lat, "lng": lng} for lat, lng in np.round(coords, 6).tolist()
+        ]
+        length_km = float(cumulative[-1])
         avg_speed = max(definition.get("average_speed_kmh", 35.0), 5.0)
         loop_seconds = int(max(length_km / avg_speed * 3600, 900))
 
-        origin_lat, origin_lng = coords[0]
-        dest_lat, dest_lng = coords[-1]
+        origin = point_dicts[0]
+        destination = point_dicts[-1]
+
+        route = {
+            "id": definition["id"],
+            "name": definition["name"],
+            "color": definition.get("color", "#2563eb"),
+            "points": coords,
+            "point_dicts": point_dicts,
+            "point_dicts_json": dumps_json(point_dicts),
+            "cumulative_km": cumulative,
+            "length_km": length_km,
+            "distance_km": round(length_km, 2),
+            "average_speed_kmh": avg_speed,
+            "loop_seconds": loop_seconds,
+            "origin": {
+                "label": definition.get("origin_label", "Origin"),
+                **origin,
+            },
+            "destination": {
+                "label": definition.get("destination_label", "Destination"),
+                **destination,
+            },
+        }
+        # Payload fragments shared by every vehicle and snapshot on this route.
+        route["summary"] = {
+            "id": route["id"],
+            "name": route["name"],
+            "color": route["color"],
+            "progress": 0,
+            "distance_km": route["distance_km"],
+            "origin": route["origin"],
+            "destination": route["destination"],
+        }
+        route["catalog_entry"] = {
+            "id": route["id"],
+            "name": route["name"],
+            "color": route["color"],
+            "distance_km": route["distance_km"],
+            "loop_seconds": route["loop_seconds"],
+            "origin": route["origin"],
+            "destination": route["destination"],
+        }
+        routes.append(route)
+    return routes
 
-        routes.append(
-            {
-                "id": definition["id"],
-                "name": definition["name"],
-                "color": definition.get("color", "#2563eb"),
-                "points": coords,
-                "point_dicts": point_dicts,
-                "cumulative_km": cumulative,
-                "length_km": length_km,
-                "average_speed_kmh": avg_speed,
-                "loop_seconds": loop_seconds,
-                "origin": {
-                    "label": definition.get("origin_label", "Origin"),
-                    "lat": round(origin_lat, 6),
-                    "lng": round(origin_lng, 6),
-                },
-                "destination": {
-                    "label": definition.get("destination_label", "Destination"),
-                    "lat": round(dest_lat, 6),
-                    "lng": round(dest_lng, 6),
-                },
-            }
+
+@functools.lru_cache(maxsize=1)
+def get_routes() -> List[Dict]:
+    """
+    Built on first use rather than at import, so management commands and
+    test collection never decode the route polylines.
+    """
+    return _build_routes()
+
+
+@functools.lru_cache(maxsize=1)
+def _route_path_json() -> Dict[int, str]:
+    # Keyed by list identity: vehicles share their route's point_dicts list.
+    return {id(route["point_dicts"]): route["point_dicts_json"] for route in get_routes()}
+
+
+def __getattr__(name: str):
+    # ROUTES used to be a module-level constant; keep it importable.
+    if name == "ROUTES":
+        return get_routes()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Kalman state for every tracked vehicle, stored structure-of-arrays so one
+# vectorised predict/update serves the whole fleet. FILTER_STATE maps a
+# vehicle key to its row; clearing it recycles the rows.
+FILTER_STATE: DefaultDict[str, int] = defaultdict(lambda: len(FILTER_STATE))
+_FILTER_STATES = np.zeros((0, 4))
+_FILTER_COVARIANCES = np.zeros((0, 4, 4))
+_FILTER_TIMESTAMPS = np.zeros(0)
+_FILTER_RAW_FIXES = np.zeros((0, 2))  # Last raw (lat, lng) fed to each filter.
+# A repeat poll of an unchanged fix this soon after the last update reuses
+# the filtered position instead of running predict/update again.
+FILTER_SKIP_DEGREES = 1e-7
+FILTER_SKIP_SECONDS = 0.5
+
+
+def _reserve_filter_rows(size: int) -> None:
+    global _FILTER_STATES, _FILTER_COVARIANCES, _FILTER_TIMESTAMPS, _FILTER_RAW_FIXES
+    capacity = len(_FILTER_TIMESTAMPS)
+    if size <= capacity:
+        return
+    capacity = max(size, 2 * capacity, 16)
+    _FILTER_STATES = np.resize(_FILTER_STATES, (capacity, 4))
+    _FILTER_COVARIANCES = np.resize(_FILTER_COVARIANCES, (capacity, 4, 4))
+    _FILTER_TIMESTAMPS = np.resize(_FILTER_TIMESTAMPS, capacity)
+    _FILTER_RAW_FIXES = np.resize(_FILTER_RAW_FIXES, (capacity, 2))
+
+
+def _kf_batch_step(
+    states: np.ndarray,
+    covariances: np.ndarray,
+    dt: np.ndarray,
+    lat: np.ndarray,
+    lng: np.ndarray,
+    process_variance: float,
+    measurement_variance: float,
+) -> None:
+    """
+    One constant-velocity predict and position-only update over a batch of
+    (B, 4) states and (B, 4, 4) covariances, updated in place. The Joseph
+    form keeps each covariance symmetric positive definite over long runs.
+    """
+    dt_col = dt[:, None]
+    states[:, 0:2] += dt_col * states[:, 2:4]
+    covariances[:, 0:2, :] += dt[:, None, None] * covariances[:, 2:4, :]
+    covariances[:, :, 0:2] += dt[:, None, None] * covariances[:, :, 2:4]
+
+    dt2 = dt * dt
+    dt3 = dt2 * dt
+    dt4 = dt3 * dt
+    q = process_variance
+    for axis in (0, 1):
+        covariances[:, axis, axis] += 0.25 * dt4 * q
+        covariances[:, axis, axis + 2] += 0.5 * dt3 * q
+        covariances[:, axis + 2, axis] += 0.5 * dt3 * q
+        covariances[:, axis + 2, axis + 2] += dt2 * q
+
+    S = covariances[:, 0:2, 0:2] + measurement_variance * np.eye(2)
+    # S is symmetric, so solving S X = P[:2, :] yields K^T without an inverse.
+    K = np.linalg.solve(S, covariances[:, 0:2, :]).transpose(0, 2, 1)  # (B, 4, 2)
+    residual = np.stack((lat - states[:, 0], lng - states[:, 1]), axis=1)
+    states += np.einsum("bij,bj->bi", K, residual)
+
+    KP2 = K @ covariances[:, 0:2, :]
+    covariances += K @ S @ K.transpose(0, 2, 1) - KP2 - KP2.transpose(0, 2, 1)
+    covariances[:] = 0.5 * (covariances + covariances.transpose(0, 2, 1))
+
+
+def _filter_positions(
+    vehicle_keys: Sequence[str], timestamp: float, lat: np.ndarray, lng: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Smooth one raw fix per vehicle; vehicles seen for the first time start a
+    new filter at their raw position.
+    """
+    # Unseen keys are handed the next row by FILTER_STATE's factory, so rows
+    # at or past the previous size are exactly the new filters.
+    known_count = len(FILTER_STATE)
+    rows = np.fromiter(
+        (FILTER_STATE[key] for key in vehicle_keys), dtype=np.intp, count=len(vehicle_keys)
+    )
+    fresh = rows >= known_count
+    _reserve_filter_rows(len(FILTER_STATE))
+
+    new_rows = rows[fresh]
+    _FILTER_STATES[new_rows] = 0.0
+    _FILTER_STATES[new_rows, 0] = lat[fresh]
+    _FILTER_STATES[new_rows, 1] = lng[fresh]
+    _FILTER_COVARIANCES[new_rows] = np.diag([1e-3, 1e-3, 1e-2, 1e-2])
+    _FILTER_TIMESTAMPS[new_rows] = timestamp
+
+    known = ~fresh
+    known[known] = ~(
+        (np.abs(lat[known] - _FILTER_RAW_FIXES[rows[known], 0]) < FILTER_SKIP_DEGREES)
+        & (np.abs(lng[known] - _FILTER_RAW_FIXES[rows[known], 1]) < FILTER_SKIP_DEGREES)
+        & (timestamp - _FILTER_TIMESTAMPS[rows[known]] < FILTER_SKIP_SECONDS)
+    )
+    if known.any():
+        known_rows = rows[known]
+        states = _FILTER_STATES[known_rows]
+        covariances = _FILTER_COVARIANCES[known_rows]
+        dt = np.maximum(timestamp - _FILTER_TIMESTAMPS[known_rows], 1.0)
+        _kf_batch_step(
+            states,
+            covariances,
+            dt,
+            lat[known],
+            lng[known],
+            KALMAN_PROCESS_VARIANCE,
+            KALMAN_MEASUREMENT_VARIANCE,
         )
-    return routes
+        _FILTER_STATES[known_rows] = states
+        _FILTER_COVARIANCES[known_rows] = covariances
+        _FILTER_TIMESTAMPS[known_rows] = timestamp
+
+    updated = rows[fresh | known]
+    _FILTER_RAW_FIXES[updated, 0] = lat[fresh | known]
+    _FILTER_RAW_FIXES[updated, 1] = lng[fresh | known]
+    return _FILTER_STATES[rows, 0], _FILTER_STATES[rows, 1]
 
 
-ROUTES = _build_routes()
-FILTER_STATE: Dict[str, KalmanFilter2D] = {}
+def _iso_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
 
 
-def _filter_position(vehicle_key: str, timestamp: float, lat: float, lng: float) -> Tuple[float, float]:
-    kalman = FILTER_STATE.get(vehicle_key)
-    if kalman is None:
-        kalman = KalmanFilter2D()
-        FILTER_STATE[vehicle_key] = kalman
-    return kalman.step(timestamp, lat, lng)
+# The columns generate_vehicle_data reads; the rest are never loaded.
+SNAPSHOT_VEHICLE_FIELDS = (
+    "name", "vin", "status", "latitude", "longitude", "license_plate", "make", "model",
+    "driver_name", "driver_phone", "driver_license",
+)
 
 
-def generate_vehicle_data(count: int = 10) -> List[Dict]:
+def generate_vehicle_data(count: int = 10, timestamp: float | None = None) -> List[Dict]:
     """
     Produce a snapshot of vehicles based on their state in the database.
     """
-    now = datetime.now(timezone.utc)
+    if timestamp is None:
+        timestamp = time.time()
+    last_update = _iso_timestamp(timestamp)
     vehicles: List[Dict] = []
-    if not ROUTES:
+    routes = get_routes()
+    if not routes:
         return vehicles
 
-    db_vehicles = Vehicle.objects.filter(is_disabled=False)
+    db_vehicles = Vehicle.objects.filter(is_disabled=False).only(*SNAPSHOT_VEHICLE_FIELDS)
 
     for vehicle in db_vehicles:
         # Associate a route for display purposes, can be improved later
-        route = ROUTES[vehicle.id % len(ROUTES)]
+        route = routes[vehicle.id % len(routes)]
 
         speed_kmh = 0
         trail = []
@@ -443,13 +541,13 @@ def generate_vehicle_data(count: int = 10) -> List[Dict]:
                 "status": vehicle.get_status_display(),
                 "speed_kmh": speed_kmh,
                 "heading": 0,  # Simplified for now
-                "location": {"lat": vehicle.latitude, "lng": vehicle.longitude},
+                "location": None,  # Filled in by the batched Kalman pass below.
                 "raw_location": {"lat": vehicle.latitude, "lng": vehicle.longitude},
                 "trail": trail,
                 "upcoming": [], # Simplified for now
                 "path": route["point_dicts"],
-                "last_update": now.isoformat(),
-                "last_update_epoch": now.timestamp(),
+                "last_update": last_update,
+                "last_update_epoch": timestamp,
                 "eta_minutes": 0, # Simplified for now
                 "identifiers": {
                     "license_plate": vehicle.license_plate,
@@ -459,103 +557,135 @@ def generate_vehicle_data(count: int = 10) -> List[Dict]:
                     "driver_license": driver_license,
                     "vehicle_type": f"{vehicle.make} {vehicle.model}",
                 },
-                "route": {
-                    "id": route["id"],
-                    "name": route["name"],
-                    "color": route["color"],
-                    "progress": 0,
-                    "distance_km": round(route["length_km"], 2),
-                    "origin": route["origin"],
-                    "destination": route["destination"],
-                },
+                "route": route["summary"],
             }
         )
 
+    if vehicles:
+        filtered_lat, filtered_lng = _filter_positions(
+            [vehicle["uid"] for vehicle in vehicles],
+            timestamp,
+            np.array([vehicle["raw_location"]["lat"] for vehicle in vehicles]),
+            np.array([vehicle["raw_location"]["lng"] for vehicle in vehicles]),
+        )
+        for vehicle, lat, lng in zip(vehicles, filtered_lat.tolist(), filtered_lng.tolist()):
+            vehicle["location"] = {"lat": lat, "lng": lng}
+
     return vehicles
 
 
-def _interpolate_position(route: Dict, distance_km: float) -> Tuple[float, float, int]:
-    cumulative = route["cumulative_km"]
-    points = route["points"]
+def dumps_vehicles(vehicles: Sequence[Dict]) -> str:
+    """
+    JSON-encode a vehicle list, splicing in each route's pre-serialised path
+    instead of re-encoding the same few thousand points for every vehicle.
+    """
+    encoded = []
+    for vehicle in vehicles:
+        if "path" not in vehicle:
+            # A delta record from diff_vehicles.
+            encoded.append(dumps_json(vehicle))
+            continue
+        body = dumps_json({key: value for key, value in vehicle.items() if key != "path"})
+        path_json = _route_path_json().get(id(vehicle["path"]))
+        if path_json is None:
+            path_json = dumps_json(vehicle["path"])
+        encoded.append(f'{body[:-1]}, "path": {path_json}}}')
+    return f"[{', '.join(encoded)}]"
+
 
-    if distance_km <= 0 or len(points) == 1:
-        lat, lng = points[0]
-        return lat, lng, 0
+# Refreshed on every tick, so they never count as a change on their own.
+_DELTA_IGNORED_KEYS = frozenset({"last_update", "last_update_epoch"})
 
-    if distance_km >= cumulative[-1]:
-        lat, lng = points[-1]
-        return lat, lng, len(points) - 1
 
-    idx = bisect.bisect_left(cumulative, distance_km)
-    if cumulative[idx] == distance_km:
-        lat, lng = points[idx]
-        return lat, lng, max(idx - 1, 0)
+def diff_vehicles(
+    previous: Mapping[str, Dict], vehicles: Sequence[Dict]
+) -> Tuple[List[Dict], List[str]]:
+    """
+    Compare a snapshot's vehicles with the previous one, keyed by uid.
 
-    prev_idx = max(idx - 1, 0)
-    start_lat, start_lng = points[prev_idx]
-    end_lat, end_lng = points[idx]
-    segment_distance = cumulative[idx] - cumulative[prev_idx]
-    if segment_distance <= 0:
-        return start_lat, start_lng, prev_idx
+    Returns the new vehicles in full and, for changed ones, records holding
+    the uid and only the fields that differ, plus the uids that are no
+    longer present. The per-tick timestamps alone never count as a change.
+    """
+    changed = []
+    for vehicle in vehicles:
+        before = previous.get(vehicle["uid"])
+        if before is None:
+            changed.append(vehicle)
+            continue
+        # Paths are the routes' shared point lists: compared by identity,
+        # and left out unless the vehicle moved to another route.
+        delta = {
+            key: value
+            for key, value in vehicle.items()
+            if (before.get(key) is not value if key == "path" else before.get(key) != value)
+        }
+        if delta.keys() - _DELTA_IGNORED_KEYS:
+            delta["uid"] = vehicle["uid"]
+            changed.append(delta)
+    current = {vehicle["uid"] for vehicle in vehicles}
+    removed = [uid for uid in previous if uid not in current]
+    return changed, removed
+
+
+class LazyJSON:
+    """
+    A value paired with its JSON encoding, produced on first use and then
+    reused, so consumers sharing a snapshot encode it at most once.
+    """
 
-    ratio = (distance_km - cumulative[prev_idx]) / segment_distance
-    lat = start_lat + (end_lat - start_lat) * ratio
-    lng = start_lng + (end_lng - start_lng) * ratio
-    return lat, lng, prev_idx
+    __slots__ = ("value", "_encode", "_encoded")
 
+    def __init__(self, value, encode=dumps_json):
+        self.value = value
+        self._encode = encode
+        self._encoded = None
 
-def _route_heading(route: Dict, segment_index: int, lat: float, lng: float) -> float:
-    points = route["points"]
-    next_index = min(segment_index + 1, len(points) - 1)
-    next_lat, next_lng = points[next_index]
-    if next_index == segment_index:
-        prev_index = max(segment_index - 1, 0)
-        prev_lat, prev_lng = points[prev_index]
-        return _bearing_deg(prev_lat, prev_lng, lat, lng)
-    return _bearing_deg(lat, lng, next_lat, next_lng)
+    def __str__(self) -> str:
+        if self._encoded is None:
+            self._encoded = self._encode(self.value)
+        return self._encoded
 
 
-def _route_segments(
-    route: Dict, segment_index: int, lat: float, lng: float
-) -> Tuple[List[Dict], List[Dict]]:
-    """Split the route into completed and upcoming segments for rendering."""
-    point_dicts = route["point_dicts"]
-    current_point = {"lat": round(lat, 6), "lng": round(lng, 6)}
+def get_tracking_snapshot() -> Mapping:
+    """
+    Provide a ready-to-use snapshot for templates and APIs.
 
-    tail_start = max(segment_index - 60, 0)
-    trail = list(point_dicts[tail_start : segment_index + 1])
-    if not trail or trail[-1] != current_point:
-        trail.append(current_point)
+    Snapshots are shared by every caller within the same wall-clock second,
+    so the Kalman filters advance at most once per second. The mapping is a
+    read-only view, timestamp included, so a cache hit touches nothing.
+    Concurrent callers wait for the one build rather than racing it, which
+    would also advance the shared filter state twice.
+    """
+    with _SNAPSHOT_LOCK:
+        return _cached_snapshot(int(time.time()))
 
-    upcoming = [current_point] + point_dicts[segment_index + 1 :]
-    if len(upcoming) <= 1:
-        upcoming = []
 
-    return trail, upcoming
+def get_vehicle_feed_json() -> bytes:
+    """
+    The vehicle API response body for the current snapshot, encoded once and
+    shared by every poll within the same second.
+    """
+    with _SNAPSHOT_LOCK:
+        return _cached_vehicle_feed(int(time.time()))
 
 
-def _determine_status(progress: float, speed: float, base_speed: float) -> str:
-    if progress < 0.05:
-        return "Departing Terminal"
-    if progress > 0.95:
-        return "Approaching Destination"
-    if speed < base_speed * 0.6:
-        return "Congested"
-    return "En Route"
+def clear_tracking_snapshot_cache() -> None:
+    _cached_snapshot.cache_clear()
+    _cached_vehicle_feed.cache_clear()
 
 
-def get_tracking_snapshot() -> Dict:
+@functools.lru_cache(maxsize=1)
+def get_static_overlays() -> Dict:
     """
-    Provide a ready-to-use snapshot for templates and APIs.
+    Snapshot sections that only depend on module constants and the route
+    geometry, built once per process.
     """
-    vehicles = generate_vehicle_data()
-    statuses = sorted({vehicle["status"] for vehicle in vehicles})
-    route_filters = sorted({vehicle["fleet_area"] for vehicle in vehicles})
-
+    routes = get_routes()
     legend = {
         "routes": [
             {"name": route["name"], "color": route["color"]}
-            for route in ROUTES
+            for route in routes
         ],
         "traffic": [
             {"label": "Heavy", "color": "#ef4444"},
@@ -569,28 +699,60 @@ def get_tracking_snapshot() -> Dict:
     }
 
     return {
-        "vehicles": vehicles,
-        "status_filters": statuses,
-        "fleet_filters": route_filters,
         "center_location": {
             "lat": BASE_LOCATION[0],
             "lng": BASE_LOCATION[1],
             "zoom": 11,
         },
-        "generation_time": datetime.now(timezone.utc).isoformat(),
-        "route_catalog": [
-            {
-                "id": route["id"],
-                "name": route["name"],
-                "color": route["color"],
-                "distance_km": round(route["length_km"], 2),
-                "loop_seconds": route["loop_seconds"],
-                "origin": route["origin"],
-                "destination": route["destination"],
-            }
-            for route in ROUTES
-        ],
-        "geofences": [dict(fence) for fence in GEOFENCES],
-        "depots": [dict(depot) for depot in DEPOTS],
+        "route_catalog": [route["catalog_entry"] for route in routes],
+        "geofences": GEOFENCES,
+        "depots": DEPOTS,
         "legend": legend,
     }
+
+
+@functools.lru_cache(maxsize=1)
+def get_static_overlays_json() -> Dict[str, str]:
+    """
+    The static overlays pre-encoded for inlining into the map template.
+    """
+    overlays = get_static_overlays()
+    return {
+        "center_json": dumps_json(overlays["center_location"]),
+        "geofences_json": dumps_json(overlays["geofences"]),
+        "depots_json": dumps_json(overlays["depots"]),
+        "route_catalog_json": dumps_json(overlays["route_catalog"]),
+        "legend_json": dumps_json(overlays["legend"]),
+    }
+
+
+# Re-entrant: the vehicle feed builds the snapshot while holding it.
+_SNAPSHOT_LOCK = threading.RLock()
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_snapshot(second: int) -> Mapping:
+    timestamp = time.time()
+    vehicles = generate_vehicle_data(timestamp=timestamp)
+    statuses = sorted({vehicle["status"] for vehicle in vehicles})
+    route_filters = sorted({vehicle["fleet_area"] for vehicle in vehicles})
+
+    return MappingProxyType(
+        {
+            "vehicles": vehicles,
+            "vehicles_json": LazyJSON(vehicles, dumps_vehicles),
+            "status_filters": statuses,
+            "fleet_filters": route_filters,
+            "generation_time": _iso_timestamp(timestamp),
+            **get_static_overlays(),
+        }
+    )
+
+
+@functools.lru_cache(maxsize=2)
+def _cached_vehicle_feed(second: int) -> bytes:
+    snapshot = _cached_snapshot(second)
+    return '{{"timestamp": {}, "vehicles": {}}}'.format(
+        dumps_json(snapshot["generation_time"]),
+        snapshot["vehicles_json"],
+    ).encode("utf-8")
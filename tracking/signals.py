@@ -0,0 +1,51 @@
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Route, Vehicle
+from .pathfinder import clear_route_graph_cache
+from .services import clear_tracking_snapshot_cache
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+def invalidate_route_graph(sender, **kwargs):
+    clear_route_graph_cache()
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+def invalidate_tracking_snapshot(sender, **kwargs):
+    clear_tracking_snapshot_cache()
+
+
+TILE_SETTINGS = {
+    "MAPBOX_ACCESS_TOKEN",
+    "MAPBOX_STYLE_ID",
+    "OPENSTREET_TILE_URL",
+    "OPENSTREET_ATTRIBUTION",
+}
+
+
+@receiver(setting_changed)
+def reset_tile_config(sender, setting, **kwargs):
+    if setting in TILE_SETTINGS:
+        from .views import get_tile_config
+
+        get_tile_config.cache_clear()
+
+
+@receiver(setting_changed)
+def reset_accel_redirect_config(sender, setting, **kwargs):
+    if setting in ("TRACKING_ACCEL_REDIRECT_ROOT", "TRACKING_ACCEL_REDIRECT_LOCATION"):
+        from .views import get_accel_redirect_config
+
+        get_accel_redirect_config.cache_clear()
+
+
+@receiver(setting_changed)
+def reset_traffic_config(sender, setting, **kwargs):
+    if setting == "TRAFFIC_CONFIG":
+        from .traffic import get_traffic_config
+
+        get_traffic_config.cache_clear()
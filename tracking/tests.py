@@ -1,11 +1,28 @@
-from django.test import Client, TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
 
-from . import services
+import numpy as np
+import requests
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import cache
+from django.test import AsyncClient, Client, TestCase, override_settings
+from shapely.geometry import LineString
+
+from . import pathfinder, services, traffic, views
+from .models import Route, Vehicle
 
 
 class TrackingServicesTests(TestCase):
     def setUp(self):
         services.FILTER_STATE.clear()
+        services.clear_tracking_snapshot_cache()
 
     def test_snapshot_includes_overlays_and_identifiers(self):
         snapshot = services.get_tracking_snapshot()
@@ -67,9 +84,81 @@ class TrackingServicesTests(TestCase):
         )
 
 
+    def test_snapshot_is_shared_within_a_second_until_vehicles_change(self):
+        with mock.patch.object(services.time, "time", return_value=1_700_000_000.2):
+            first = services.get_tracking_snapshot()
+            self.assertIs(services.get_tracking_snapshot(), first)
+
+            Vehicle.objects.first().save()
+            self.assertIsNot(services.get_tracking_snapshot(), first)
+
+        with self.assertRaises(TypeError):
+            first["generation_time"] = "tampered"
+
+    def test_decode_polyline6_accepts_bytes(self):
+        polyline = services.ROUTE_DEFINITIONS[0]["polyline"]
+        expected = services.decode_polyline6(polyline)
+        encoded = polyline.encode("ascii")
+
+        self.assertEqual(services.decode_polyline6(encoded), expected)
+        self.assertEqual(services.decode_polyline6(memoryview(encoded)), expected)
+
+    def test_unchanged_fix_within_skip_window_reuses_filtered_position(self):
+        lat = np.array([23.8103])
+        lng = np.array([90.4125])
+        services._filter_positions(["probe"], 1000.0, lat, lng)
+        first = services._filter_positions(["probe"], 1005.0, lat + 1e-4, lng)
+        row = services.FILTER_STATE["probe"]
+        covariance = services._FILTER_COVARIANCES[row].copy()
+
+        repeat = services._filter_positions(["probe"], 1005.2, lat + 1e-4, lng)
+        np.testing.assert_array_equal(repeat, first)
+        np.testing.assert_array_equal(services._FILTER_COVARIANCES[row], covariance)
+        self.assertEqual(services._FILTER_TIMESTAMPS[row], 1005.0)
+
+        moved = services._filter_positions(["probe"], 1005.4, lat + 2e-4, lng)
+        self.assertNotEqual(moved[0][0], first[0][0])
+
+    def test_route_geometry_cache_round_trips(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with mock.patch.object(services, "ROUTE_CACHE_DIR", cache_dir):
+                computed = services._load_route_geometry()
+                self.assertTrue(os.path.exists(services._route_cache_path()))
+                with mock.patch.object(services, "_compute_route_geometry") as compute:
+                    cached = services._load_route_geometry()
+                compute.assert_not_called()
+
+        for key in ("points", "cumulative", "offsets"):
+            np.testing.assert_array_equal(computed[key], cached[key])
+
+
+    def test_snapshot_encodes_its_vehicles_once(self):
+        snapshot = services.get_tracking_snapshot()
+
+        with mock.patch.object(
+            snapshot["vehicles_json"], "_encode", wraps=services.dumps_vehicles
+        ) as encode:
+            first = str(snapshot["vehicles_json"])
+            second = str(snapshot["vehicles_json"])
+
+        encode.assert_called_once_with(snapshot["vehicles"])
+        self.assertIs(first, second)
+        self.assertEqual(json.loads(first), json.loads(services.dumps_vehicles(snapshot["vehicles"])))
+
+    def test_dumps_vehicles_matches_plain_json_encoding(self):
+        vehicles = services.generate_vehicle_data()
+        custom = dict(vehicles[0], path=[{"lat": 1.0, "lng": 2.0}])
+
+        self.assertEqual(
+            json.loads(services.dumps_vehicles(vehicles + [custom])),
+            json.loads(json.dumps(vehicles + [custom])),
+        )
+
+
 class VehicleAPITests(TestCase):
     def setUp(self):
         services.FILTER_STATE.clear()
+        services.clear_tracking_snapshot_cache()
         self.client = Client()
 
     def test_vehicle_api_returns_enriched_payload(self):
@@ -91,3 +180,617 @@ class VehicleAPITests(TestCase):
         self.assertIn("upcoming", vehicle)
         self.assertIn("raw_location", vehicle)
         self.assertIn("location", vehicle)
+
+    def test_vehicle_api_is_gzip_compressed_on_request(self):
+        response = self.client.get("/api/vehicles/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertIn("vehicles", json.loads(gzip.decompress(response.content)))
+
+    def test_compressed_feed_is_reused_and_revalidates(self):
+        body = b'{"timestamp": "2024-01-01T00:00:00+00:00", "vehicles": []}'
+        views._gzip_body.cache_clear()
+        with mock.patch("tracking.views.get_vehicle_feed_json", return_value=body), mock.patch(
+            "tracking.views.gzip.compress", wraps=gzip.compress
+        ) as compress:
+            first = self.client.get("/api/vehicles/", HTTP_ACCEPT_ENCODING="gzip")
+            repeat = self.client.get("/api/vehicles/", HTTP_ACCEPT_ENCODING="gzip")
+            revalidated = self.client.get(
+                "/api/vehicles/", HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+
+        compress.assert_called_once()
+        self.assertEqual(gzip.decompress(first.content), body)
+        self.assertEqual(repeat.content, first.content)
+        self.assertTrue(first["ETag"].startswith("W/"))
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_unchanged_vehicle_feed_is_not_modified(self):
+        body = b'{"timestamp": "2024-01-01T00:00:00+00:00", "vehicles": []}'
+        with mock.patch("tracking.views.get_vehicle_feed_json", return_value=body):
+            first = self.client.get("/api/vehicles/")
+            second = self.client.get("/api/vehicles/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(first.content, body)
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+
+    @override_settings(VEHICLE_STREAM_ENABLED=True)
+    def test_vehicle_stream_starts_with_the_full_fleet(self):
+        response = self.client.get("/api/vehicles/stream/")
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        event = next(iter(response.streaming_content)).decode()
+        response.close()
+        self.assertTrue(event.startswith("event: vehicles\ndata: "))
+        payload = json.loads(event.split("data: ", 1)[1])
+        self.assertTrue(payload["reset"])
+        self.assertEqual(len(payload["vehicles"]), Vehicle.objects.filter(is_disabled=False).count())
+
+    def test_vehicle_stream_is_not_found_while_disabled(self):
+        self.assertEqual(self.client.get("/api/vehicles/stream/").status_code, 404)
+
+    @override_settings(VEHICLE_STREAM_ENABLED=True)
+    def test_vehicle_stream_ends_after_its_lifetime(self):
+        with mock.patch.object(views.VehicleStreamView, "max_age_seconds", 0):
+            response = self.client.get("/api/vehicles/stream/")
+            events = list(response.streaming_content)
+
+        self.assertEqual(len(events), 1)
+
+    @override_settings(VEHICLE_STREAM_ENABLED=True)
+    def test_vehicle_stream_is_not_gzipped(self):
+        response = self.client.get("/api/vehicles/stream/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertFalse(response.has_header("Content-Encoding"))
+        event = next(iter(response.streaming_content)).decode()
+        response.close()
+        self.assertTrue(event.startswith("event: vehicles\ndata: "))
+        self.assertTrue(event.endswith("\n\n"))
+        self.assertIn("vehicles", json.loads(event.split("data: ", 1)[1]))
+
+    @override_settings(VEHICLE_STREAM_ENABLED=True)
+    async def test_vehicle_stream_is_async_under_asgi(self):
+        response = await AsyncClient().get("/api/vehicles/stream/")
+
+        self.assertTrue(response.is_async)
+        event = (await response.streaming_content.__anext__()).decode()
+        self.assertTrue(event.startswith("event: vehicles\n"))
+
+    def test_diff_vehicles_reports_changes_and_removals(self):
+        vehicles = services.get_tracking_snapshot()["vehicles"]
+        previous = {vehicle["uid"]: vehicle for vehicle in vehicles}
+        moved = dict(vehicles[0], speed_kmh=vehicles[0]["speed_kmh"] + 1, last_update="later")
+        retimed = dict(vehicles[1], last_update="later")
+
+        changed, removed = services.diff_vehicles(previous, [moved, retimed])
+
+        self.assertEqual(
+            changed,
+            [{"uid": moved["uid"], "speed_kmh": moved["speed_kmh"], "last_update": "later"}],
+        )
+        self.assertEqual(sorted(removed), sorted(v["uid"] for v in vehicles[2:]))
+
+    def test_stream_deltas_leave_out_unchanged_fields(self):
+        snapshot = services.get_tracking_snapshot()
+        ticked = [
+            dict(vehicle, speed_kmh=vehicle["speed_kmh"] + 1, last_update="later")
+            for vehicle in snapshot["vehicles"]
+        ]
+        next_snapshot = dict(
+            snapshot, vehicles=ticked, vehicles_json=services.LazyJSON(ticked, services.dumps_vehicles)
+        )
+        view, state = views.VehicleStreamView(), {}
+        with mock.patch("tracking.views.get_tracking_snapshot", side_effect=[snapshot, next_snapshot]):
+            reset = view._next_event(state)
+            delta = view._next_event(state)
+
+        payload = json.loads(delta.split("data: ", 1)[1])
+        self.assertEqual(len(payload["vehicles"]), len(ticked))
+        self.assertTrue(all(set(v) == {"uid", "speed_kmh", "last_update"} for v in payload["vehicles"]))
+        self.assertLess(len(delta), 100 * len(ticked))
+        self.assertLess(len(delta) * 10, len(reset))
+
+    def test_assigning_an_idle_vehicle_puts_it_en_route(self):
+        vehicle = Vehicle.objects.first()
+        Vehicle.objects.filter(pk=vehicle.pk).update(status="idle", is_disabled=False)
+        self.assertIn(
+            {"id": vehicle.pk, "name": vehicle.name},
+            self.client.get("/api/idle-vehicles/").json(),
+        )
+
+        with self.assertNumQueries(2):
+            response = self.client.post(
+                "/api/assign-vehicle/",
+                data=json.dumps({"vehicle_id": vehicle.pk, "lat": 23.8, "lng": 90.4}),
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        vehicle.refresh_from_db()
+        self.assertEqual((vehicle.status, vehicle.latitude), ("en_route", 23.8))
+
+        repeat = self.client.post(
+            "/api/assign-vehicle/",
+            data=json.dumps({"vehicle_id": vehicle.pk, "lat": 23.9, "lng": 90.5}),
+            content_type="application/json",
+        )
+        self.assertEqual(repeat.status_code, 409)
+        vehicle.refresh_from_db()
+        self.assertEqual(vehicle.latitude, 23.8)
+
+    def test_location_and_status_updates_reach_the_vehicle(self):
+        vehicle = Vehicle.objects.first()
+
+        location = self.client.put(
+            "/api/vehicles/location/",
+            data=json.dumps({"vehicle_id": vehicle.pk, "lat": 23.7, "lng": 90.3}),
+            content_type="application/json",
+        )
+        status = self.client.put(
+            "/api/vehicles/status/",
+            data=json.dumps({"vehicle_id": vehicle.pk, "status": "maintenance"}),
+            content_type="application/json",
+        )
+        missing = self.client.put(
+            "/api/vehicles/status/",
+            data=json.dumps({"vehicle_id": 999999, "status": "idle"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual((location.status_code, status.status_code, missing.status_code), (200, 200, 404))
+        vehicle.refresh_from_db()
+        self.assertEqual((vehicle.latitude, vehicle.longitude, vehicle.status), (23.7, 90.3, "maintenance"))
+
+    def test_feed_is_handed_to_nginx_when_accel_redirect_is_configured(self):
+        body = b'{"timestamp": "2024-01-01T00:00:00+00:00", "vehicles": []}'
+        etag = views._body_etag(body)
+        with tempfile.TemporaryDirectory() as root, self.settings(
+            TRACKING_ACCEL_REDIRECT_ROOT=root
+        ):
+            stale = os.path.join(root, "vehicles-stale.json")
+            open(stale, "wb").close()
+            os.utime(stale, (0, 0))
+            with mock.patch("tracking.views.get_vehicle_feed_json", return_value=body):
+                response = self.client.get("/api/vehicles/")
+                repeat = self.client.get("/api/vehicles/")
+
+            path = os.path.join(root, f"vehicles-{etag}.json")
+            with open(path, "rb") as plain, open(path + ".gz", "rb") as compressed:
+                self.assertEqual(plain.read(), body)
+                self.assertEqual(gzip.decompress(compressed.read()), body)
+            self.assertEqual(sorted(os.listdir(root)), [f"vehicles-{etag}.json", f"vehicles-{etag}.json.gz"])
+
+        self.assertEqual(response["X-Accel-Redirect"], f"/internal/tracking/vehicles-{etag}.json")
+        self.assertEqual(repeat["X-Accel-Redirect"], response["X-Accel-Redirect"])
+        self.assertEqual(response["ETag"], f'"{etag}"')
+        self.assertEqual(response.content, b"")
+
+    def test_assigned_route_api_returns_stored_path(self):
+        route = Route.objects.create(name="Depot loop", path=[[23.81, 90.41], [23.82, 90.42]])
+        vehicle = Vehicle.objects.first()
+        vehicle.assigned_route = route
+        vehicle.save()
+
+        with self.assertNumQueries(1):
+            response = self.client.post(
+                "/api/vehicles/route/",
+                data={"vehicle_id": vehicle.pk},
+                content_type="application/json",
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"path": [[23.81, 90.41], [23.82, 90.42]]})
+
+    def test_assigned_route_api_without_route_returns_empty_path(self):
+        vehicle = Vehicle.objects.filter(assigned_route__isnull=True).first()
+
+        response = self.client.post(
+            "/api/vehicles/route/",
+            data={"vehicle_id": vehicle.pk},
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.json(), {"path": []})
+
+
+class TrafficSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_snapshot_is_cached_between_calls(self):
+        config = dict(settings.TRAFFIC_CONFIG, provider="tomtom")
+        with override_settings(TRAFFIC_CONFIG=config), mock.patch.object(
+            traffic, "_tomtom_flow_segments", return_value=[]
+        ) as fetch:
+            first = traffic.get_traffic_snapshot()
+            second = traffic.get_traffic_snapshot()
+
+        fetch.assert_called_once()
+        self.assertEqual(first["source"], "fallback-sample")
+        self.assertEqual(second, first)
+
+    def test_concurrent_misses_share_one_upstream_request(self):
+        def slow_build(provider):
+            time.sleep(0.05)
+            return {"generated": "now", "source": traffic.FALLBACK_SOURCE, "features": []}
+
+        with mock.patch.object(traffic, "_build_traffic_snapshot", side_effect=slow_build) as build:
+            workers = [threading.Thread(target=traffic.get_traffic_snapshot) for _ in range(4)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        build.assert_called_once()
+
+    def test_prefetch_starts_a_build_only_when_uncached(self):
+        with mock.patch.object(traffic.threading, "Thread") as thread:
+            traffic.prefetch_traffic_snapshot()
+            cache.set(traffic.get_traffic_config()["body_key"], b"{}")
+            traffic.prefetch_traffic_snapshot()
+
+        thread.assert_called_once()
+        self.assertIs(thread.call_args.kwargs["target"], traffic.get_traffic_snapshot_json)
+
+    def test_tomtom_segments_are_encoded_from_arrays(self):
+        payload = {
+            "flowSegmentData": [
+                {
+                    "coordinates": {
+                        "coordinate": [
+                            {"latitude": 23.78, "longitude": 90.39},
+                            {"latitude": 23.79, "longitude": 90.40},
+                        ]
+                    },
+                    "freeFlowSpeed": 50,
+                    "currentSpeed": 15,
+                }
+            ]
+        }
+        config = dict(settings.TRAFFIC_CONFIG, provider="tomtom", tomtom_api_key="key")
+        response = mock.Mock(**{"json.return_value": payload})
+        with override_settings(TRAFFIC_CONFIG=config), mock.patch.object(
+            traffic._SESSION, "get", return_value=response
+        ):
+            api_response = Client().get("/api/traffic/")
+
+        feature = api_response.json()["features"][0]
+        self.assertEqual(api_response.json()["source"], "tomtom")
+        self.assertEqual(feature["coordinates"], [[90.39, 23.78], [90.40, 23.79]])
+        self.assertEqual(feature["severity"], "HEAVY")
+
+    def test_traffic_api_serves_fallback_segments(self):
+        with override_settings(TRAFFIC_CONFIG=dict(settings.TRAFFIC_CONFIG, provider="")):
+            response = Client().get("/api/traffic/")
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(payload["source"], traffic.FALLBACK_SOURCE)
+        self.assertEqual(payload["features"], traffic._fallback_segments())
+        self.assertIn("generated", payload)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        self.assertIn("Last-Modified", response)
+        self.assertIn("ETag", response)
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class MapViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        services.clear_tracking_snapshot_cache()
+        prefetch = mock.patch("tracking.views.prefetch_traffic_snapshot")
+        self.prefetch = prefetch.start()
+        self.addCleanup(prefetch.stop)
+
+    def test_map_page_inlines_snapshot_payloads(self):
+        response = Client().get("/")
+        self.assertEqual(response.status_code, 200)
+
+        bootstrap = json.loads(response.context["bootstrap_json"])
+        overlays = services.get_static_overlays()
+        self.assertEqual(bootstrap["routeCatalog"], overlays["route_catalog"])
+        self.assertEqual(bootstrap["center"], overlays["center_location"])
+        self.assertIsInstance(bootstrap["vehicles"], list)
+        self.assertIn("openstreet", bootstrap["mapTiles"]["providers"])
+
+    def test_map_page_honours_if_modified_since(self):
+        snapshot = services.get_tracking_snapshot()
+        with mock.patch("tracking.views.get_tracking_snapshot", return_value=snapshot):
+            response = Client().get("/")
+            repeat = Client().get("/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+
+        self.assertEqual(repeat.status_code, 304)
+
+    def test_rendered_page_is_reused_within_its_ttl(self):
+        first = Client().get("/")
+        with mock.patch("tracking.views.get_static_overlays_json") as overlays, mock.patch(
+            "tracking.views.get_tracking_snapshot"
+        ) as snapshot:
+            repeat = Client().get("/")
+
+        overlays.assert_not_called()
+        snapshot.assert_not_called()
+        self.assertEqual(repeat.content, first.content)
+        self.assertEqual(repeat["Last-Modified"], first["Last-Modified"])
+
+    def test_map_page_leaves_traffic_to_the_api(self):
+        with mock.patch("tracking.views.get_traffic_snapshot_json") as traffic_snapshot:
+            response = Client().get("/")
+
+        traffic_snapshot.assert_not_called()
+        self.prefetch.assert_called_once()
+        bootstrap = json.loads(response.context["bootstrap_json"])
+        self.assertEqual(bootstrap["trafficUrl"], "/api/traffic/")
+
+    def test_vehicle_stream_is_only_offered_when_enabled(self):
+        bootstrap = json.loads(Client().get("/").context["bootstrap_json"])
+        self.assertIsNone(bootstrap["vehicleStreamUrl"])
+
+        cache.clear()
+        with self.settings(VEHICLE_STREAM_ENABLED=True):
+            bootstrap = json.loads(Client().get("/").context["bootstrap_json"])
+        self.assertEqual(bootstrap["vehicleStreamUrl"], "/api/vehicles/stream/")
+
+    def test_tile_config_follows_setting_overrides(self):
+        self.assertEqual(Client().get("/").context["default_tile_provider"], "openstreet")
+
+        cache.clear()  # Drop the rendered page cached by the first request.
+        with self.settings(MAPBOX_ACCESS_TOKEN="pk.test"):
+            response = Client().get("/")
+        self.assertEqual(response.context["default_tile_provider"], "mapbox")
+        bootstrap = json.loads(response.context["bootstrap_json"])
+        self.assertEqual(bootstrap["mapTiles"]["providers"]["mapbox"]["accessToken"], "pk.test")
+
+
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class VehicleListViewTests(TestCase):
+    def test_list_renders_without_deferred_field_queries(self):
+        client = Client()
+        vehicle_count = Vehicle.objects.count()
+        self.assertGreater(vehicle_count, 0)
+
+        with self.assertNumQueries(1):
+            response = client.get("/vehicles/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["object_list"]), vehicle_count)
+
+
+    def test_disable_view_toggles_the_flag(self):
+        vehicle = Vehicle.objects.filter(is_disabled=False).first()
+        client = Client()
+
+        with self.assertNumQueries(1):
+            response = client.post(f"/vehicles/{vehicle.pk}/disable/")
+        self.assertRedirects(response, "/vehicles/", fetch_redirect_response=False)
+        vehicle.refresh_from_db()
+        self.assertTrue(vehicle.is_disabled)
+
+        client.post(f"/vehicles/{vehicle.pk}/disable/")
+        vehicle.refresh_from_db()
+        self.assertFalse(vehicle.is_disabled)
+
+        self.assertEqual(client.post("/vehicles/0/disable/").status_code, 404)
+
+
+class PathfinderTests(TestCase):
+    def setUp(self):
+        self.graph = pathfinder.Graph()
+        a, b, c, d = (
+            self.graph.intern((0.0, float(index))) for index in range(4)
+        )
+        for from_node, to_node, distance in ((a, b, 1.0), (b, c, 1.0), (a, c, 5.0), (c, d, 1.0)):
+            self.graph.add_edge(from_node, to_node, distance)
+            self.graph.add_edge(to_node, from_node, distance)
+
+    def test_dijkstra_finds_shortest_distances(self):
+        distances, path = pathfinder.dijkstra(self.graph, 0)
+
+        self.assertEqual(distances, {0: 0, 1: 1.0, 2: 2.0, 3: 3.0})
+        self.assertEqual(path[2], 1)
+        self.assertEqual(path[3], 2)
+
+    def test_shortest_path_reconstructs_route(self):
+        self.graph.intern((1.0, 1.0))
+
+        distance, route = pathfinder.shortest_path(self.graph, (0.0, 0.0), (0.0, 3.0))
+
+        self.assertAlmostEqual(distance, 3.0)
+        self.assertEqual(route, [(0.0, 0.0), (0.0, 1.0), (0.0, 2.0), (0.0, 3.0)])
+        self.assertEqual(
+            pathfinder.shortest_path(self.graph, (0.0, 0.0), (1.0, 1.0)),
+            (None, []),
+        )
+
+    def test_bidirectional_dijkstra_matches_single_source_search(self):
+        distance, route = pathfinder.bidirectional_dijkstra(self.graph, 0, 3)
+
+        self.assertAlmostEqual(distance, pathfinder.dijkstra(self.graph, 0)[0][3])
+        self.assertEqual(route, [0, 1, 2, 3])
+
+    def test_crossing_polylines_share_a_junction_node(self):
+        first = [(0.0, 0.0), (2.0, 2.0)]
+        second = [(0.0, 2.0), (2.0, 0.0)]
+        lines = [LineString(first), LineString(second)]
+
+        junctions = pathfinder._find_junctions(lines)
+
+        self.assertEqual(
+            pathfinder._splice_junctions(first, lines[0], junctions[0]),
+            [(0.0, 0.0), (1.0, 1.0), (2.0, 2.0)],
+        )
+        self.assertEqual(
+            pathfinder._splice_junctions(second, lines[1], junctions[1]),
+            [(0.0, 2.0), (1.0, 1.0), (2.0, 0.0)],
+        )
+
+    def test_graph_built_from_routes_is_connected(self):
+        graph = pathfinder.build_graph_from_routes(services.ROUTE_DEFINITIONS[:1])
+        start = services.decode_polyline6(services.ROUTE_DEFINITIONS[0]["polyline"])[0]
+
+        distances, _ = pathfinder.dijkstra(graph, graph.node_ids[start])
+
+        self.assertEqual(len(distances), len(graph.nodes))
+
+    def test_route_graph_is_cached_until_routes_change(self):
+        routes = services.ROUTE_DEFINITIONS[:1]
+        graph = pathfinder.get_route_graph(routes)
+
+        self.assertIs(pathfinder.get_route_graph(routes), graph)
+
+        Route.objects.create(name="New corridor", path=[])
+        self.assertIsNot(pathfinder.get_route_graph(routes), graph)
+
+    def test_nearest_node_snaps_to_closest_coordinate(self):
+        self.assertEqual(pathfinder.nearest_node(self.graph, 0.1, 2.2), 2)
+
+        self.graph.intern((0.1, 2.2))
+        self.assertEqual(pathfinder.nearest_node(self.graph, 0.1, 2.2), 4)
+
+    def test_network_route_connects_points_near_a_route(self):
+        routes = services.ROUTE_DEFINITIONS[:1]
+        points = services.decode_polyline6(routes[0]["polyline"])
+        start, end = points[0], points[-1]
+
+        distance, coords = pathfinder.find_network_route(
+            routes, (start[0] + 1e-5, start[1]), (end[0], end[1] - 1e-5)
+        )
+
+        self.assertEqual((coords[0], coords[-1]), (start, end))
+        self.assertGreater(distance, 0)
+
+    def test_network_route_rejects_points_far_from_every_route(self):
+        routes = services.ROUTE_DEFINITIONS[:1]
+        start = services.decode_polyline6(routes[0]["polyline"])[0]
+
+        self.assertEqual(pathfinder.find_network_route(routes, start, (0.0, 0.0)), (None, []))
+        self.assertEqual(
+            pathfinder.find_network_route(routes, (start[0] + 1e-4, start[1]), start, max_snap_km=0.005),
+            (None, []),
+        )
+
+    def test_warm_route_graph_prepares_the_shared_graph(self):
+        pathfinder.clear_route_graph_cache()
+        pathfinder.warm_route_graph(services.ROUTE_DEFINITIONS)
+
+        graph = pathfinder.get_route_graph(services.ROUTE_DEFINITIONS)
+        self.assertEqual(pathfinder._cached_graph.cache_info().misses, 1)
+        self.assertIn("node_index", graph._derived)
+
+    def test_warm_up_only_runs_when_enabled(self):
+        config = django_apps.get_app_config("tracking")
+        with mock.patch("tracking.pathfinder.warm_route_graph") as warm:
+            config.warm_up()
+            warm.assert_not_called()
+            with self.settings(WARM_ROUTE_GRAPH=True):
+                config.warm_up()
+        warm.assert_called_once_with(services.ROUTE_DEFINITIONS)
+
+
+class FindRouteViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_rejects_missing_or_out_of_range_coordinates(self):
+        response = Client().get(
+            "/find-route/", {"start_lat": "91", "start_lng": "90.4", "end_lat": "nan"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["error"]), {"start_lat", "end_lat", "end_lng"})
+
+    def test_osrm_falls_back_to_the_pooled_session_without_httpx(self):
+        response = mock.Mock(json=mock.Mock(return_value={"code": "Ok"}))
+        with mock.patch.object(views, "httpx", None), mock.patch.object(
+            views._OSRM_SESSION, "get", return_value=response
+        ) as get:
+            data = async_to_sync(views._fetch_osrm)("http://osrm.test/route")
+
+        self.assertEqual(data, {"code": "Ok"})
+        get.assert_called_once_with("http://osrm.test/route", timeout=views.OSRM_TIMEOUT_SECONDS)
+        response.raise_for_status.assert_called_once()
+
+    def test_osrm_uses_the_pooled_session_outside_asgi(self):
+        response = mock.Mock(json=mock.Mock(return_value={"code": "NoRoute"}))
+        with mock.patch.object(views, "_osrm_client") as client, mock.patch.object(
+            views._OSRM_SESSION, "get", return_value=response
+        ) as get:
+            Client().get(
+                "/find-route/",
+                {"start_lat": 23.80, "start_lng": 90.40, "end_lat": 23.81, "end_lng": 90.41},
+            )
+
+        client.assert_not_called()
+        get.assert_called_once()
+
+    def test_non_json_osrm_reply_is_handled(self):
+        with mock.patch(
+            "tracking.views._fetch_osrm", side_effect=json.JSONDecodeError("Expecting value", "<html>", 0)
+        ), mock.patch("tracking.views.find_network_route", return_value=(None, [])):
+            response = Client().get(
+                "/find-route/",
+                {"start_lat": 23.80, "start_lng": 90.40, "end_lat": 23.81, "end_lng": 90.41},
+            )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["error"], "Error contacting routing service")
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        osrm = {
+            "code": "Ok",
+            "routes": [{"geometry": {"coordinates": [[90.40, 23.80], [90.41, 23.81]]}, "distance": 1500}],
+        }
+        with mock.patch("tracking.views._fetch_osrm", return_value=osrm) as fetch:
+            first = Client().get(
+                "/find-route/",
+                {"start_lat": 23.80, "start_lng": 90.40, "end_lat": 23.81, "end_lng": 90.41},
+            )
+            second = Client().get(
+                "/find-route/",
+                {"start_lat": 23.800001, "start_lng": 90.40, "end_lat": 23.81, "end_lng": 90.41},
+            )
+
+        fetch.assert_called_once()
+        self.assertEqual(first.json(), {"path": [[23.80, 90.40], [23.81, 90.41]], "distance": 1.5})
+        self.assertEqual(second.content, first.content)
+
+    def test_falls_back_to_route_network_when_osrm_is_unreachable(self):
+        start, end = services.get_routes()[0]["points"][[0, -1]].tolist()
+
+        with mock.patch(
+            "tracking.views._fetch_osrm",
+            side_effect=requests.exceptions.ConnectionError("offline"),
+        ):
+            response = Client().get(
+                "/find-route/",
+                {"start_lat": start[0], "start_lng": start[1], "end_lat": end[0], "end_lng": end[1]},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertGreater(len(payload["path"]), 1)
+        self.assertGreater(payload["distance"], 0)
+        self.assertEqual(payload["source"], "local-network")
+
+    async def test_route_network_fallback_runs_off_the_event_loop(self):
+        threads = []
+
+        def record_thread(*args):
+            threads.append(threading.get_ident())
+            return None, []
+
+        with mock.patch(
+            "tracking.views._fetch_osrm",
+            side_effect=requests.exceptions.ConnectionError("offline"),
+        ), mock.patch("tracking.views.find_network_route", side_effect=record_thread):
+            response = await AsyncClient().get(
+                "/find-route/",
+                {"start_lat": "23.8", "start_lng": "90.4", "end_lat": "23.9", "end_lng": "90.5"},
+            )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
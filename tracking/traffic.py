@@ -4,13 +4,20 @@ Falls back to static sample segments when no provider key is configured.
 """
 from __future__ import annotations
 
+import functools
 import json
 import logging
+import threading
 from datetime import datetime, timezone
 from typing import Dict, List, Tuple
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
 from django.conf import settings
+from django.core.cache import cache
+
+from .services import dumps_json
 
 LOGGER = logging.getLogger(__name__)
 
@@ -21,17 +28,92 @@ DHAKA_BBOX: Tuple[float, float, float, float] = (   #for dhaka city bounding box
     23.90, # max lat
 )
 
+_BUILD_LOCK = threading.Lock()
+
+# Pooled keep-alive connections so refreshes skip the TCP/TLS handshake.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 
 def get_traffic_snapshot() -> Dict:
+    """
+    Return the traffic overlay, cached for TRAFFIC_CONFIG["cache_seconds"] so
+    page loads and API polls share one upstream request. Fallback results are
+    cached too, which keeps a failing provider from being retried per request.
+    """
+    config = get_traffic_config()
+    cache_key = config["snapshot_key"]
+    snapshot = cache.get(cache_key)
+    if snapshot is None:
+        # One upstream request per expiry in this process, however many
+        # requests miss at once.
+        with _BUILD_LOCK:
+            snapshot = cache.get(cache_key)
+            if snapshot is None:
+                snapshot = _build_traffic_snapshot(config["provider"])
+                cache.set(cache_key, snapshot, config["cache_seconds"])
+    return snapshot
+
+
+def get_traffic_snapshot_json() -> bytes:
+    """
+    The traffic API response body, encoded once per cached snapshot and
+    stored alongside it so warm requests return the bytes as-is.
+    """
+    config = get_traffic_config()
+    body = cache.get(config["body_key"])
+    if body is None:
+        snapshot = get_traffic_snapshot()
+        if snapshot["source"] == FALLBACK_SOURCE:
+            features_json = FALLBACK_SEGMENTS_JSON
+        else:
+            features_json = dumps_json(snapshot["features"])
+        body = '{{"generated": {}, "source": {}, "features": {}}}'.format(
+            dumps_json(snapshot["generated"]),
+            dumps_json(snapshot["source"]),
+            features_json,
+        ).encode("utf-8")
+        cache.set(config["body_key"], body, config["cache_seconds"])
+    return body
+
+
+def prefetch_traffic_snapshot() -> None:
+    """
+    Start building the traffic body in the background when it is not cached,
+    so the page's own /api/traffic/ request, issued once the HTML arrives,
+    finds it ready or joins the build already in flight.
+    """
+    if _BUILD_LOCK.locked() or cache.has_key(get_traffic_config()["body_key"]):
+        return
+    threading.Thread(target=get_traffic_snapshot_json, name="traffic-prefetch", daemon=True).start()
+
+
+@functools.lru_cache(maxsize=1)
+def get_traffic_config() -> Dict:
+    """
+    The TRAFFIC_CONFIG values read on every request, with the cache keys
+    derived from them. Built once per process; the setting_changed receiver
+    in signals.py clears it for tests.
+    """
     provider = settings.TRAFFIC_CONFIG.get("provider", "").lower()
+    suffix = "{}:{}".format(provider, ",".join(map(str, DHAKA_BBOX)))
+    return {
+        "provider": provider,
+        "cache_seconds": settings.TRAFFIC_CONFIG.get("cache_seconds", 30),
+        "snapshot_key": f"traffic_snapshot:{suffix}",
+        "body_key": f"traffic_body:{suffix}",
+    }
+
+
+def _build_traffic_snapshot(provider: str) -> Dict:
     if provider == "tomtom":
         features = _tomtom_flow_segments()
     else:
         features = []
 
     if not features:
-        features = _fallback_segments()
-        source = "fallback-sample"
+        features = FALLBACK_SEGMENTS
+        source = FALLBACK_SOURCE
     else:
         source = provider
 
@@ -55,7 +137,7 @@ def _tomtom_flow_segments() -> List[Dict]:
     LOGGER.info(f"Requesting TomTom traffic with URL: {url}")
 
     try:
-        response = requests.get(url, timeout=settings.TRAFFIC_CONFIG.get("timeout_seconds", 5))
+        response = _SESSION.get(url, timeout=settings.TRAFFIC_CONFIG.get("timeout_seconds", 5))
         response.raise_for_status()
         payload = response.json()
     except (requests.exceptions.RequestException, json.JSONDecodeError) as error:
@@ -67,9 +149,16 @@ def _tomtom_flow_segments() -> List[Dict]:
         return features
 
     for segment in payload['flowSegmentData']:
-        coordinates = [[p['longitude'], p['latitude']] for p in segment.get('coordinates', {}).get('coordinate', [])]
-        if not coordinates:
+        points = segment.get('coordinates', {}).get('coordinate', [])
+        if not points:
             continue
+        # (lng, lat) rows straight into one array; dumps_json encodes it as
+        # nested lists without an intermediate list-of-lists.
+        coordinates = np.fromiter(
+            (value for p in points for value in (p['longitude'], p['latitude'])),
+            dtype=np.float64,
+            count=2 * len(points),
+        ).reshape(-1, 2)
 
         free_flow_speed = segment.get('freeFlowSpeed', 100)
         current_speed = segment.get('currentSpeed', 100)
@@ -131,3 +220,9 @@ def _fallback_segments() -> List[Dict]:
             "description": "Smooth flow on Dhaka - Chittagong Highway segment.",
         },
     ]
+
+
+FALLBACK_SOURCE = "fallback-sample"
+FALLBACK_SEGMENTS = _fallback_segments()
+# Served verbatim by the traffic API whenever the fallback is in use.
+FALLBACK_SEGMENTS_JSON = dumps_json(FALLBACK_SEGMENTS)
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    MapView, TrafficDataAPIView, VehicleDataAPIView, VehicleListView, 
+    MapView, TrafficDataAPIView, VehicleDataAPIView, VehicleStreamView, VehicleListView, 
     VehicleCreateView, VehicleUpdateView, VehicleDeleteView, VehicleDisableView, 
     FindRouteView, IdleVehicleListView, AssignVehicleView, VehicleLocationAPIView, VehicleStatusAPIView, AssignedRouteAPIView
 )
@@ -16,6 +16,7 @@ urlpatterns = [
     path("vehicles/<int:pk>/disable/", VehicleDisableView.as_view(), name="disable-vehicle"),
     path("find-route/", FindRouteView.as_view(), name="find-route"),
     path("api/vehicles/", VehicleDataAPIView.as_view(), name="vehicle-data"),
+    path("api/vehicles/stream/", VehicleStreamView.as_view(), name="vehicle-stream"),
     path("api/vehicles/location/", VehicleLocationAPIView.as_view(), name="vehicle-location"),
     path("api/vehicles/status/", VehicleStatusAPIView.as_view(), name="vehicle-status"),
     path("api/traffic/", TrafficDataAPIView.as_view(), name="traffic-data"),
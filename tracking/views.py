@@ -1,96 +1,223 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import gzip
+import hashlib
 import json
-
+import logging
+import os
+import re
+import tempfile
+import time
+import weakref
+from datetime import datetime
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from asgiref.sync import sync_to_async
 from django.conf import settings
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import F, TextField
+from django.db.models.functions import Cast
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_page
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.views.generic import TemplateView, View, CreateView, ListView, UpdateView, DeleteView
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, parse_http_date_safe
+
+from .models import Vehicle
+from .forms import RouteParamsForm, VehicleForm
+from .pathfinder import find_network_route
+from .services import (
+    ROUTE_DEFINITIONS,
+    clear_tracking_snapshot_cache,
+    diff_vehicles,
+    dumps_json,
+    dumps_vehicles,
+    get_static_overlays_json,
+    get_tracking_snapshot,
+    get_vehicle_feed_json,
+)
+from .traffic import get_traffic_snapshot, get_traffic_snapshot_json, prefetch_traffic_snapshot
+
+try:
+    import httpx
+except ImportError:  # httpx is optional; OSRM is then called via requests in a thread.
+    httpx = None
 
+logger = logging.getLogger(__name__)
 
-from .models import Vehicle, Route
-from .forms import VehicleForm
-
-
-from .services import get_tracking_snapshot
-from .traffic import get_traffic_snapshot
-
-
+OSRM_TIMEOUT_SECONDS = 5.0
+OSRM_CACHE_SECONDS = 3600
+# Four decimal places is about 10 m, so repeat clicks on the same spot
+# share one OSRM lookup.
+OSRM_CACHE_PRECISION = 4
+# ValueError covers an upstream body that is not JSON.
+OSRM_ERRORS = (requests.exceptions.RequestException, ValueError) + (
+    (httpx.HTTPError,) if httpx else ()
+)
+# httpx connections are bound to the event loop that opened them, so the
+# pooled client is kept per loop: one per worker under ASGI. It is only used
+# there; under WSGI each request runs on a fresh loop.
+_OSRM_CLIENTS = weakref.WeakKeyDictionary()
+
+# Without httpx: one pooled keep-alive session shared by the worker threads,
+# retrying transient gateway errors.
+_OSRM_SESSION = requests.Session()
+_OSRM_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504)),
+)
+_OSRM_SESSION.mount("http://", _OSRM_ADAPTER)
+_OSRM_SESSION.mount("https://", _OSRM_ADAPTER)
+
+
+# The page holds nothing per-user and its snapshot changes once a second, so
+# a rendered copy is shared for a couple of seconds.
+MAP_PAGE_CACHE_SECONDS = 2
+
+
+def _snapshot_last_modified(request, *args, **kwargs):
+    return datetime.fromisoformat(get_tracking_snapshot()["generation_time"])
+
+
+# A cache hit skips the snapshot entirely: the Last-Modified stored with the
+# page is that of the snapshot it was rendered from.
+@method_decorator(cache_page(MAP_PAGE_CACHE_SECONDS), name="get")
 class MapView(TemplateView):
     template_name = "tracking/map.html"
+    traffic_url = reverse_lazy("tracking:traffic-data")
+    vehicle_stream_url = reverse_lazy("tracking:vehicle-stream")
+
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        if request.method != "GET":
+            return response
+        # Outside the page cache, so cached copies are revalidated too.
+        return get_conditional_response(
+            request,
+            last_modified=parse_http_date_safe(response.get("Last-Modified")),
+            response=response,
+        )
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        generated = datetime.fromisoformat(response.context_data["generation_time"])
+        response["Last-Modified"] = http_date(generated.timestamp())
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Overlap the upstream traffic fetch with rendering this page.
+        prefetch_traffic_snapshot()
         snapshot = get_tracking_snapshot()
-        context.update(snapshot)
-        # Pre-serialize payloads for browsers that lack the json_script tag.
-        context["vehicles_json"] = json.dumps(snapshot["vehicles"])
-        context["center_json"] = json.dumps(snapshot["center_location"])
-        context["generation_time_json"] = json.dumps(snapshot["generation_time"])
-        context["geofences_json"] = json.dumps(snapshot["geofences"])
-        context["depots_json"] = json.dumps(snapshot["depots"])
-        context["route_catalog_json"] = json.dumps(snapshot["route_catalog"])
-        context["legend_json"] = json.dumps(snapshot["legend"])
-        traffic_snapshot = get_traffic_snapshot()
-        context["traffic_source"] = traffic_snapshot["source"]
-        context["traffic_generated"] = traffic_snapshot["generated"]
-        context["traffic_features_json"] = json.dumps(traffic_snapshot["features"])
-        context["traffic_meta_json"] = json.dumps(
-            {
-                "source": traffic_snapshot["source"],
-                "generated": traffic_snapshot["generated"],
-            }
-        )
-        mapbox_token = getattr(settings, "MAPBOX_ACCESS_TOKEN", "") or ""
-        mapbox_style = getattr(settings, "MAPBOX_STYLE_ID", "mapbox/streets-v12")
-        openstreet_url = getattr(
-            settings,
-            "OPENSTREET_TILE_URL",
-            "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
-        )
-        openstreet_attribution = getattr(
-            settings,
-            "OPENSTREET_ATTRIBUTION",
-            '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
+        # Only what the template renders server-side; the page script gets
+        # everything else from the bootstrap payload below.
+        for key in ("vehicles", "status_filters", "fleet_filters", "generation_time"):
+            context[key] = snapshot[key]
+        tile_config = get_tile_config()
+        context["tile_provider_choices"] = tile_config["choices"]
+        context["default_tile_provider"] = tile_config["default"]
+
+        # Everything the page script needs goes out as one JSON object. The
+        # static overlays are spliced in from their cached encodings, and
+        # traffic is fetched by the page from the API rather than inlined.
+        overlays = get_static_overlays_json()
+        fragments = {
+            "vehicles": str(snapshot["vehicles_json"]),
+            "generationTime": dumps_json(snapshot["generation_time"]),
+            "center": overlays["center_json"],
+            "geofences": overlays["geofences_json"],
+            "depots": overlays["depots_json"],
+            "routeCatalog": overlays["route_catalog_json"],
+            "legend": overlays["legend_json"],
+            "trafficUrl": dumps_json(str(self.traffic_url)),
+            # null keeps the page polling /api/vehicles/.
+            "vehicleStreamUrl": dumps_json(
+                str(self.vehicle_stream_url)
+                if getattr(settings, "VEHICLE_STREAM_ENABLED", False)
+                else None
+            ),
+            "mapTiles": tile_config["json"],
+        }
+        context["bootstrap_json"] = "{%s}" % ", ".join(
+            f'"{key}": {value}' for key, value in fragments.items()
         )
+        return context
 
-        tile_providers = {}
-        tile_provider_choices = []
-
-        if mapbox_token:
-            tile_providers["mapbox"] = {
-                "accessToken": mapbox_token,
-                "styleId": mapbox_style,
-            }
-            tile_provider_choices.append(
-                {"key": "mapbox", "label": "Mapbox"}
-            )
 
-        tile_providers["openstreet"] = {
-            "tileUrl": openstreet_url,
-            "attribution": openstreet_attribution,
-            "maxZoom": 19,
+@functools.lru_cache(maxsize=1)
+def get_tile_config():
+    """
+    Tile provider choices and their encoded client config. Settings are
+    fixed after start-up, so this is built once per process; the
+    setting_changed receiver in signals.py clears it for tests.
+    """
+    mapbox_token = getattr(settings, "MAPBOX_ACCESS_TOKEN", "") or ""
+    mapbox_style = getattr(settings, "MAPBOX_STYLE_ID", "mapbox/streets-v12")
+    openstreet_url = getattr(
+        settings,
+        "OPENSTREET_TILE_URL",
+        "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+    )
+    openstreet_attribution = getattr(
+        settings,
+        "OPENSTREET_ATTRIBUTION",
+        '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
+    )
+
+    tile_providers = {}
+    tile_provider_choices = []
+
+    if mapbox_token:
+        tile_providers["mapbox"] = {
+            "accessToken": mapbox_token,
+            "styleId": mapbox_style,
         }
         tile_provider_choices.append(
-            {"key": "openstreet", "label": "OpenStreetMap"}
+            {"key": "mapbox", "label": "Mapbox"}
         )
 
-        default_provider = "mapbox" if mapbox_token else "openstreet"
-        context["tile_provider_choices"] = tile_provider_choices
-        context["default_tile_provider"] = default_provider
-        context["map_tiles_config_json"] = json.dumps(
+    tile_providers["openstreet"] = {
+        "tileUrl": openstreet_url,
+        "attribution": openstreet_attribution,
+        "maxZoom": 19,
+    }
+    tile_provider_choices.append(
+        {"key": "openstreet", "label": "OpenStreetMap"}
+    )
+
+    default_provider = "mapbox" if mapbox_token else "openstreet"
+    return {
+        "choices": tile_provider_choices,
+        "default": default_provider,
+        "json": dumps_json(
             {
                 "providers": tile_providers,
                 "defaultProvider": default_provider,
             }
-        )
-        return context
+        ),
+    }
 
 
 class VehicleListView(ListView):
     model = Vehicle
     template_name = 'tracking/vehicle_list.html'
+    # The list only shows these columns and follows no relations.
+    list_fields = ('name', 'license_plate', 'make', 'model', 'year', 'is_disabled')
+
+    def get_queryset(self):
+        return super().get_queryset().only(*self.list_fields)
 
 class VehicleCreateView(CreateView):
     model = Vehicle
@@ -110,24 +237,57 @@ class VehicleDeleteView(DeleteView):
 
 class VehicleDisableView(View):
     def post(self, request, *args, **kwargs):
-        vehicle = Vehicle.objects.get(pk=self.kwargs['pk'])
-        vehicle.is_disabled = not vehicle.is_disabled
-        vehicle.save()
+        # Flip the flag in a single UPDATE; no instance is loaded or saved.
+        toggled = Vehicle.objects.filter(pk=self.kwargs['pk']).update(is_disabled=~F('is_disabled'))
+        if not toggled:
+            raise Http404("Vehicle not found")
+        # update() sends no post_save, so drop the shared snapshot here.
+        clear_tracking_snapshot_cache()
         return redirect('tracking:vehicle-list')
 
-import requests
-from .services import haversine_km
 
-import logging
+def _osrm_client():
+    loop = asyncio.get_running_loop()
+    client = _OSRM_CLIENTS.get(loop)
+    if client is None:
+        client = _OSRM_CLIENTS[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(OSRM_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+        )
+    return client
+
+
+async def _fetch_osrm(url, long_lived_loop=False):
+    """
+    GET ``url`` from OSRM and return the decoded JSON, raising one of
+    ``OSRM_ERRORS`` on a transport failure, an error status or a body that
+    is not JSON. ``long_lived_loop`` says the caller's event loop outlives
+    the request, as under ASGI, so a per-loop httpx client can be pooled.
+    """
+    if httpx is not None and long_lived_loop:
+        response = await _osrm_client().get(url)
+    else:
+        # The process-wide keep-alive session, off the event loop: the
+        # round-trip would otherwise stall every other request it serves.
+        response = await sync_to_async(_OSRM_SESSION.get, thread_sensitive=False)(
+            url, timeout=OSRM_TIMEOUT_SECONDS
+        )
+    response.raise_for_status()
+    return response.json()
 
-logger = logging.getLogger(__name__)
 
 class FindRouteView(View):
-    def get(self, request, *args, **kwargs):
-        start_lat = float(request.GET.get('start_lat'))
-        start_lng = float(request.GET.get('start_lng'))
-        end_lat = float(request.GET.get('end_lat'))
-        end_lng = float(request.GET.get('end_lng'))
+    async def get(self, request, *args, **kwargs):
+        form = RouteParamsForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({'path': [], 'error': form.errors}, status=400)
+        coords = form.coordinates()
+        start_lat, start_lng, end_lat, end_lng = coords
+
+        cache_key = "osrm:" + ":".join(f"{value:.{OSRM_CACHE_PRECISION}f}" for value in coords)
+        body = await cache.aget(cache_key)
+        if body is not None:
+            return HttpResponse(body, content_type="application/json")
 
         logger.info(f"Finding route from ({start_lat}, {start_lng}) to ({end_lat}, {end_lng}) using OSRM")
 
@@ -135,41 +295,55 @@ class FindRouteView(View):
         osrm_url = f"http://router.project-osrm.org/route/v1/driving/{start_lng},{start_lat};{end_lng},{end_lat}?overview=full&geometries=geojson"
 
         try:
-            response = requests.get(osrm_url)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            data = response.json()
+            data = await _fetch_osrm(osrm_url, isinstance(request, ASGIRequest))
 
             if data.get('code') == 'Ok' and data.get('routes'):
                 route = data['routes'][0]
                 # Extract coordinates and flip them for Leaflet ([lat, lon])
                 route_coords = route['geometry']['coordinates']
-                path = [[coord[1], coord[0]] for coord in route_coords]
+                path = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)[:, ::-1].tolist()
 
                 # Extract distance in meters, convert to km, and round it
                 distance_km = round(route['distance'] / 1000, 2)
 
                 logger.info(f"Successfully found route with {len(path)} points and distance {distance_km} km.")
-                return JsonResponse({'path': path, 'distance': distance_km})
+                body = dumps_json({'path': path, 'distance': distance_km})
+                await cache.aset(cache_key, body, OSRM_CACHE_SECONDS)
+                return HttpResponse(body, content_type="application/json")
             else:
                 logger.error(f"OSRM API could not find a route. Response: {data}")
-                return JsonResponse({'path': [], 'error': 'Route not found'}, status=404)
+                fallback = await self._network_route(start_lat, start_lng, end_lat, end_lng)
+                return fallback or JsonResponse({'path': [], 'error': 'Route not found'}, status=404)
 
-        except requests.exceptions.RequestException as e:
+        except OSRM_ERRORS as e:
             logger.error(f"Error calling OSRM API: {e}")
-            return JsonResponse({'path': [], 'error': 'Error contacting routing service'}, status=500)
-
+            fallback = await self._network_route(start_lat, start_lng, end_lat, end_lng)
+            return fallback or JsonResponse({'path': [], 'error': 'Error contacting routing service'}, status=500)
+
+    async def _network_route(self, start_lat, start_lng, end_lat, end_lng):
+        # Fall back to the prebuilt graph of the simulated fleet routes,
+        # searched in a thread: building a cold graph or a long search
+        # would otherwise stall the event loop.
+        distance, coords = await sync_to_async(find_network_route, thread_sensitive=False)(
+            ROUTE_DEFINITIONS, (start_lat, start_lng), (end_lat, end_lng)
+        )
+        if distance is None:
+            return None
+        logger.info(f"Using local route network: {len(coords)} points, {distance:.2f} km.")
+        # Marked so clients can tell it from a road route found by OSRM.
+        return _json_response(
+            {'path': coords, 'distance': round(distance, 2), 'source': 'local-network'}
+        )
 
-from django.utils.decorators import method_decorator
-from django.views.decorators.csrf import csrf_exempt
 
 class IdleVehicleListView(View):
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         idle_vehicles = Vehicle.objects.filter(status='idle', is_disabled=False).values('id', 'name')
-        return JsonResponse(list(idle_vehicles), safe=False)
+        return JsonResponse([vehicle async for vehicle in idle_vehicles], safe=False)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class AssignVehicleView(View):
-    def post(self, request, *args, **kwargs):
+    async def post(self, request, *args, **kwargs):
         try:
             data = json.loads(request.body)
             vehicle_id = data.get('vehicle_id')
@@ -179,13 +353,20 @@ class AssignVehicleView(View):
             if not all([vehicle_id, lat, lng]):
                 return JsonResponse({'error': 'Missing data'}, status=400)
 
-            vehicle = Vehicle.objects.get(pk=vehicle_id)
-            vehicle.latitude = lat
-            vehicle.longitude = lng
-            vehicle.status = 'en_route'
-            vehicle.save()
+            vehicles = Vehicle.objects.filter(pk=vehicle_id)
+            # Only the name is read back; the change itself is one UPDATE.
+            name = await vehicles.values_list('name', flat=True).aget()
+            # The idle check is part of the UPDATE, so of two concurrent
+            # assignments only one can match the row.
+            assigned = await vehicles.filter(status='idle').aupdate(
+                latitude=lat, longitude=lng, status='en_route'
+            )
+            if not assigned:
+                return JsonResponse({'error': f'Vehicle {name} is not idle'}, status=409)
+            # update() sends no post_save, so drop the shared snapshot here.
+            clear_tracking_snapshot_cache()
 
-            return JsonResponse({'success': True, 'message': f'Vehicle {vehicle.name} assigned.'})
+            return JsonResponse({'success': True, 'message': f'Vehicle {name} assigned.'})
         except Vehicle.DoesNotExist:
             return JsonResponse({'error': 'Vehicle not found'}, status=404)
         except json.JSONDecodeError:
@@ -195,6 +376,19 @@ class AssignVehicleView(View):
             return JsonResponse({'error': 'An unexpected error occurred'}, status=500)
 
 
+def _update_vehicle(vehicle_id, **fields):
+    """
+    Write ``fields`` to one vehicle with a single UPDATE and return its name
+    for the response message; raises Vehicle.DoesNotExist.
+    """
+    vehicles = Vehicle.objects.filter(pk=vehicle_id)
+    name = vehicles.values_list('name', flat=True).get()
+    vehicles.update(**fields)
+    # update() sends no post_save, so drop the shared snapshot here.
+    clear_tracking_snapshot_cache()
+    return name
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class VehicleLocationAPIView(View):
     def put(self, request, *args, **kwargs):
@@ -207,12 +401,9 @@ class VehicleLocationAPIView(View):
             if not all([vehicle_id, lat, lng]):
                 return JsonResponse({'error': 'Missing vehicle_id, latitude, or longitude'}, status=400)
 
-            vehicle = Vehicle.objects.get(pk=vehicle_id)
-            vehicle.latitude = lat
-            vehicle.longitude = lng
-            vehicle.save()
+            name = _update_vehicle(vehicle_id, latitude=lat, longitude=lng)
 
-            return JsonResponse({'success': True, 'message': f'Vehicle {vehicle.name} location updated.'})
+            return JsonResponse({'success': True, 'message': f'Vehicle {name} location updated.'})
         except Vehicle.DoesNotExist:
             return JsonResponse({'error': 'Vehicle not found'}, status=404)
         except json.JSONDecodeError:
@@ -232,11 +423,9 @@ class VehicleStatusAPIView(View):
             if not all([vehicle_id, status]):
                 return JsonResponse({'error': 'Missing vehicle_id or status'}, status=400)
 
-            vehicle = Vehicle.objects.get(pk=vehicle_id)
-            vehicle.status = status
-            vehicle.save()
+            name = _update_vehicle(vehicle_id, status=status)
 
-            return JsonResponse({'success': True, 'message': f'Vehicle {vehicle.name} status updated.'})
+            return JsonResponse({'success': True, 'message': f'Vehicle {name} status updated.'})
         except Vehicle.DoesNotExist:
             return JsonResponse({'error': 'Vehicle not found'}, status=404)
         except json.JSONDecodeError:
@@ -256,14 +445,16 @@ class AssignedRouteAPIView(View):
             if not vehicle_id:
                 return JsonResponse({'error': 'Missing vehicle_id'}, status=400)
 
-            vehicle = Vehicle.objects.get(pk=vehicle_id)
+            # One joined query that returns the stored path as JSON text,
+            # forwarded as-is rather than decoded and re-encoded.
+            path_json = (
+                Vehicle.objects.filter(pk=vehicle_id)
+                .values_list(Cast('assigned_route__path', TextField()), flat=True)
+                .get()
+            )
 
-            if vehicle.assigned_route:
-                try:
-                    path_data = json.loads(vehicle.assigned_route.path)
-                    return JsonResponse({'path': path_data})
-                except json.JSONDecodeError:
-                    return JsonResponse({'error': 'Error decoding route path'}, status=500)
+            if path_json is not None:
+                return HttpResponse('{"path": %s}' % path_json, content_type="application/json")
             else:
                 return JsonResponse({'path': []})
         except Vehicle.DoesNotExist:
@@ -275,24 +466,201 @@ class AssignedRouteAPIView(View):
             return JsonResponse({'error': 'An unexpected error occurred'}, status=500)
 
 
+def _body_etag(body):
+    return hashlib.blake2s(body, digest_size=16).hexdigest()
+
+
+def _traffic_last_modified(request, *args, **kwargs):
+    return datetime.fromisoformat(get_traffic_snapshot()["generated"])
+
+
+# The bodies are cached, so hashing them for the ETag costs no extra encoding
+# and an unchanged poll is answered with an empty 304.
+@method_decorator(
+    condition(
+        etag_func=lambda request, *args, **kwargs: _body_etag(get_vehicle_feed_json()),
+        last_modified_func=_snapshot_last_modified,
+    ),
+    name="get",
+)
 class VehicleDataAPIView(View):
     def get(self, request, *args, **kwargs):
+        return _live_json_response(request, get_vehicle_feed_json(), "vehicles")
+
+
+class VehicleStreamView(View):
+    """
+    Server-sent events carrying only the vehicles that changed since the
+    previous tick. The first event resets the client to the full fleet;
+    /api/vehicles/ stays available for one-off fetches.
+
+    A stream ends after ``max_age_seconds`` so the worker (or the thread,
+    under WSGI) is released even when a disconnect goes unnoticed; the page
+    then reconnects.
+    """
+    interval_seconds = 5
+    max_age_seconds = 300
+
+    def get(self, request, *args, **kwargs):
+        # Off by default: each stream holds a connection, and under WSGI a
+        # worker thread, for up to max_age_seconds.
+        if not getattr(settings, "VEHICLE_STREAM_ENABLED", False):
+            raise Http404("Vehicle stream is disabled")
+        # Under ASGI the stream must be an async iterator, or Django buffers
+        # it whole; WSGI needs the plain generator.
+        events = self.aevents() if isinstance(request, ASGIRequest) else self.events()
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Ask nginx-style proxies to pass events through unbuffered.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def events(self):
+        state = {}
+        deadline = time.monotonic() + self.max_age_seconds
+        while True:
+            yield self._next_event(state)
+            if time.monotonic() + self.interval_seconds > deadline:
+                return
+            time.sleep(self.interval_seconds)
+
+    async def aevents(self):
+        state = {}
+        deadline = time.monotonic() + self.max_age_seconds
+        while True:
+            yield await sync_to_async(self._next_event)(state)
+            if time.monotonic() + self.interval_seconds > deadline:
+                return
+            await asyncio.sleep(self.interval_seconds)
+
+    def _next_event(self, state):
+        # Snapshots are shared per second, so every open stream reuses the
+        # same one rather than building its own.
         snapshot = get_tracking_snapshot()
-        return JsonResponse(
-            {
-                "timestamp": snapshot["generation_time"],
-                "vehicles": snapshot["vehicles"],
-            }
+        known = state.get("known")
+        changed, removed = diff_vehicles(known or {}, snapshot["vehicles"])
+        state["known"] = {vehicle["uid"]: vehicle for vehicle in snapshot["vehicles"]}
+        if known is not None and not changed and not removed:
+            # Comment line: keeps the connection alive and lets a closed
+            # client surface as a write error.
+            return ": idle\n\n"
+        data = '{{"reset": {}, "timestamp": {}, "vehicles": {}, "removed": {}}}'.format(
+            dumps_json(known is None),
+            dumps_json(snapshot["generation_time"]),
+            # A reset carries the whole fleet, already encoded on the snapshot;
+            # later events only the fields that changed.
+            snapshot["vehicles_json"] if known is None else dumps_vehicles(changed),
+            dumps_json(removed),
         )
+        return f"event: vehicles\ndata: {data}\n\n"
 
 
+@method_decorator(
+    condition(
+        etag_func=lambda request, *args, **kwargs: _body_etag(get_traffic_snapshot_json()),
+        last_modified_func=_traffic_last_modified,
+    ),
+    name="get",
+)
 class TrafficDataAPIView(View):
     def get(self, request, *args, **kwargs):
-        snapshot = get_traffic_snapshot()
-        return JsonResponse(
-            {
-                "generated": snapshot["generated"],
-                "source": snapshot["source"],
-                "features": snapshot["features"],
-            }
-        )
+        return _live_json_response(request, get_traffic_snapshot_json(), "traffic")
+
+
+def _json_response(payload, status=200):
+    # Route paths run to thousands of points; dumps_json encodes them with
+    # orjson when it is installed instead of DjangoJSONEncoder.
+    return HttpResponse(dumps_json(payload), content_type="application/json", status=status)
+
+
+_ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+
+@functools.lru_cache(maxsize=4)
+def _gzip_body(body):
+    # Keyed by the cached body, so each snapshot is compressed once rather
+    # than by GZipMiddleware on every poll.
+    return gzip.compress(body, compresslevel=4)
+
+
+@functools.lru_cache(maxsize=1)
+def get_accel_redirect_config():
+    """
+    ``(root, location)`` for handing the polled bodies to nginx, or None
+    when TRACKING_ACCEL_REDIRECT_ROOT is unset. Cleared by setting_changed.
+    """
+    root = getattr(settings, "TRACKING_ACCEL_REDIRECT_ROOT", "")
+    if not root:
+        return None
+    return root, getattr(settings, "TRACKING_ACCEL_REDIRECT_LOCATION", "/internal/tracking/")
+
+
+# Published bodies unused for this long are removed; that leaves time for
+# responses already sent by any worker to be served by nginx.
+ACCEL_REDIRECT_KEEP_SECONDS = 60
+
+
+def _publish_body(root, stem, body):
+    """
+    Make ``body`` available to nginx as ``<stem>-<etag>.json``, with a
+    ``.gz`` sibling for gzip_static, and return that name.
+
+    The name is derived from the content, so every worker process agrees on
+    it and a file under it never changes. Existing files are touched, which
+    keeps them from being pruned while they are still being served.
+    """
+    name = "%s-%s.json" % (stem, _body_etag(body))
+    path = os.path.join(root, name)
+    try:
+        os.utime(path)
+        os.utime(path + ".gz")
+        return name
+    except FileNotFoundError:
+        pass
+    # The .gz goes first, so nginx never finds the plain file without it.
+    for target, data in ((path + ".gz", _gzip_body(body)), (path, body)):
+        # Renamed into place so nginx never serves a half-written file.
+        handle, partial = tempfile.mkstemp(dir=root, suffix=".tmp")
+        with os.fdopen(handle, "wb") as stream:
+            stream.write(data)
+        os.replace(partial, target)
+    _prune_published(root, stem)
+    return name
+
+
+def _prune_published(root, stem):
+    cutoff = time.time() - ACCEL_REDIRECT_KEEP_SECONDS
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if not entry.name.startswith(stem + "-"):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+            except FileNotFoundError:
+                pass  # Pruned by another worker.
+
+
+def _live_json_response(request, body, stem):
+    accel = get_accel_redirect_config()
+    if accel is not None:
+        # nginx sends the file itself (sendfile, gzip_static); Django only
+        # answers with headers.
+        root, location = accel
+        response = HttpResponse(content_type="application/json")
+        response["X-Accel-Redirect"] = location + _publish_body(root, stem, body)
+        response["Cache-Control"] = "no-cache"
+        return response
+    # Not streamed: the body is the shared, already-encoded cache entry, so
+    # a plain response adds no copy and keeps the ETag and Content-Length.
+    if _ACCEPTS_GZIP.search(request.META.get("HTTP_ACCEPT_ENCODING", "")):
+        response = HttpResponse(_gzip_body(body), content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+        # Weak, as GZipMiddleware would make it: same content, other bytes.
+        response["ETag"] = 'W/"%s"' % _body_etag(body)
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    patch_vary_headers(response, ("Accept-Encoding",))
+    # Polled data: shared caches must revalidate before reusing a response.
+    response["Cache-Control"] = "no-cache"
+    return response
@@ -48,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost so the JSON API responses and inlined map payloads are
+    # compressed after every other middleware has seen the body.
+    'tracking.middleware.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -152,8 +155,28 @@ TRAFFIC_CONFIG = {
     "provider": os.getenv("TRAFFIC_PROVIDER", "tomtom"),
     "tomtom_api_key": os.getenv("TOMTOM_API_KEY"),
     "timeout_seconds": float(os.getenv("TRAFFIC_TIMEOUT_SECONDS", "4")),
+    "cache_seconds": float(os.getenv("TRAFFIC_CACHE_SECONDS", "30")),
 }
 
+# When set, the polled vehicle/traffic API bodies are written to this
+# directory and served by nginx via X-Accel-Redirect, with
+# TRACKING_ACCEL_REDIRECT_LOCATION mapped to it as an internal location.
+TRACKING_ACCEL_REDIRECT_ROOT = os.getenv("TRACKING_ACCEL_REDIRECT_ROOT", "")
+TRACKING_ACCEL_REDIRECT_LOCATION = os.getenv(
+    "TRACKING_ACCEL_REDIRECT_LOCATION", "/internal/tracking/"
+)
+
+# Push vehicle updates to the map over server-sent events instead of having
+# it poll /api/vehicles/. Each open map holds a connection (and, under WSGI,
+# a worker thread), so this needs a long-lived ASGI server; it stays off for
+# serverless deploys.
+VEHICLE_STREAM_ENABLED = os.getenv("VEHICLE_STREAM_ENABLED", "0") == "1"
+
+# Build the fallback route graph when a long-running server starts instead
+# of on first use. Off by default: it would otherwise sit on every
+# serverless cold start.
+WARM_ROUTE_GRAPH = os.getenv("WARM_ROUTE_GRAPH", "0") == "1"
+
 MAPBOX_ACCESS_TOKEN = os.getenv("MAPBOX_ACCESS_TOKEN")
 MAPBOX_STYLE_ID = os.getenv("MAPBOX_STYLE_ID", "mapbox/streets-v12")
 OPENSTREET_TILE_URL = os.getenv(
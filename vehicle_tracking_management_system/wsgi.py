@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 
 import os
 
+from django.apps import apps
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vehicle_tracking_management_system.settings')
 
 application = get_wsgi_application()
+
+apps.get_app_config('tracking').warm_up()